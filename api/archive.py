@@ -0,0 +1,64 @@
+"""
+Frozen documents of finished code jams.
+
+Archiving a jam stores its full document, compressed, so that it's served as it is instead of
+being built from the rows of the jam on every request. Write routes touching a jam call
+`refresh_archive` once they made their changes, in the same transaction, which rebuilds the
+document of an archived jam, or drops it if the jam became ongoing again.
+"""
+import gzip
+from typing import Optional
+
+from sqlalchemy import delete, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from api.database import ArchivedJam, Jam
+from api.documents import Document, codejam_document, render
+from api.models import CodeJamResponse
+
+
+def compress(document: Document) -> bytes:
+    """Serialize and compress the document of a jam."""
+    return gzip.compress(render(document, CodeJamResponse).body)
+
+
+async def archive_jam(session: AsyncSession, jam_id: int) -> Optional[Document]:
+    """Archive the specified jam, which shouldn't be ongoing, and return its document, or None if it doesn't exist."""
+    if not (document := await codejam_document(session, jam_id)):
+        return None
+
+    statement = insert(ArchivedJam).values(jam_id=jam_id, document=compress(document))
+    await session.execute(
+        statement.on_conflict_do_update(
+            index_elements=[ArchivedJam.jam_id],
+            set_={"document": statement.excluded.document, "archived_at": func.now()},
+        )
+    )
+
+    return document
+
+
+async def refresh_archive(session: AsyncSession, jam_id: int) -> None:
+    """Rebuild the archived document of the specified jam after a change, if it's archived."""
+    archived = await session.execute(
+        select(Jam.ongoing)
+        .join_from(ArchivedJam, Jam)
+        .where(ArchivedJam.jam_id == jam_id)
+        .with_for_update(of=ArchivedJam)
+    )
+
+    if (ongoing := archived.scalars().one_or_none()) is None:
+        return
+
+    if ongoing:
+        await session.execute(delete(ArchivedJam).where(ArchivedJam.jam_id == jam_id))
+    else:
+        await archive_jam(session, jam_id)
+
+
+async def archived_document(session: AsyncSession, jam_id: int) -> Optional[bytes]:
+    """Get the gzip compressed document of the specified jam if it's archived."""
+    documents = await session.execute(select(ArchivedJam.document).where(ArchivedJam.jam_id == jam_id))
+    return documents.scalars().one_or_none()
@@ -0,0 +1,242 @@
+"""
+Change notifications for the resources of the API.
+
+Write handlers `publish` the resources they modified, and the caches of this process `subscribe`
+to drop what those changes made stale. As with `on_commit`, subscribers are notified right away,
+and again once the transaction of the writing session commits, as other requests may have cached
+the state from before the commit in the meantime.
+
+Every published change is also written to the database, along with the rest of the transaction:
+it is appended to the change log read by sync clients, and the versions of its resources, from which
+the ETags of the responses built from them are derived, are incremented when the transaction commits.
+
+The new versions are also sent to the other processes of the API with a Postgres `NOTIFY` on `CHANNEL`,
+which is only delivered once the transaction commits. Each process runs `listen` in the background
+to notify its subscribers of the changes published by the others. Processes keep the versions they
+know of in memory, see `VersionCache`.
+"""
+import asyncio
+import logging
+import time
+import uuid
+from typing import Callable, Optional
+
+import orjson
+from sqlalchemy import event, func, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy.orm import Session
+
+from api.constants import Config
+from api.database import Change, ResourceVersion, change_positions, on_commit, on_rollback
+
+CODEJAMS = "codejams"
+INFRACTIONS = "infractions"
+TEAMS = "teams"
+USERS = "users"
+WINNERS = "winners"
+RESOURCES = frozenset({CODEJAMS, INFRACTIONS, TEAMS, USERS, WINNERS})
+
+CHANNEL = "api_changes"
+# Identifies the notifications sent by this process, whose subscribers already know about them.
+ORIGIN = uuid.uuid4().hex
+# The resources changed by the transaction of a session are stored under this key of its info.
+CHANGED_RESOURCES_KEY = "api.changed_resources"
+# And their new versions under this one, once incremented.
+COMMITTED_VERSIONS_KEY = "api.committed_versions"
+# The key of the advisory lock taken by the transactions positioning their changes in the log.
+CHANGE_LOG_LOCK = 1_906_520_196
+# The number of seconds to wait before listening again after losing the connection.
+RECONNECT_DELAY = 5.0
+
+Subscriber = Callable[[frozenset[str]], None]
+
+log = logging.getLogger(__name__)
+_subscribers: list[Subscriber] = []
+
+
+def subscribe(subscriber: Subscriber) -> None:
+    """Call `subscriber` with the set of changed resources whenever some are published."""
+    _subscribers.append(subscriber)
+
+
+def notify(resources: frozenset[str]) -> None:
+    """Notify every subscriber that the given resources changed."""
+    for subscriber in _subscribers:
+        subscriber(resources)
+
+
+async def publish(session: Optional[AsyncSession], *resources: str, **ids: Optional[int]) -> None:
+    """
+    Publish that the given resources were changed by the current transaction of `session`.
+
+    The IDs of the changed jam, team or user can be given as `jam_id`, `team_id` and `user_id`.
+    They are logged along with the changed resources.
+    """
+    changed = frozenset(resources)
+    notify(changed)
+
+    if session is not None:
+        on_commit(session, lambda: notify(changed))
+        # Caches may have been built from the changes before they were rolled back.
+        on_rollback(session, lambda: notify(changed))
+        ids = {name: id_ for name, id_ in ids.items() if id_ is not None}
+
+        await session.execute(insert(Change).values(resources=sorted(changed), **ids))
+        session.info.setdefault(CHANGED_RESOURCES_KEY, set()).update(changed)
+
+
+@event.listens_for(Session, "before_commit")
+def commit_changes(session: Session) -> None:
+    """
+    Position the changes of the transaction about to be committed, and increment the versions of their resources.
+
+    The new versions are sent to the other processes, and recorded by this one once the transaction commits.
+
+    Transactions with changes commit one at a time, from the positioning of their changes to the end of their
+    commit, so that changes are positioned in the order they are committed, see `api.documents.committed_changes`.
+
+    Incrementing a version locks it until the transaction ends, so they are all incremented at once, right before
+    committing, rather than whenever they are published. They are also sorted, so that concurrent transactions
+    lock them in the same order.
+    """
+    if not (changed := session.info.pop(CHANGED_RESOURCES_KEY, None)):
+        return
+
+    session.execute(select(func.pg_advisory_xact_lock(CHANGE_LOG_LOCK)))
+    session.execute(
+        update(Change)
+        .where(Change.transaction_id == func.txid_current(), Change.position.is_(None))
+        .values(position=change_positions.next_value())
+        .execution_options(synchronize_session=False)
+    )
+
+    statement = insert(ResourceVersion).values([{"resource": resource, "version": 1} for resource in sorted(changed)])
+    committed = session.execute(
+        statement.on_conflict_do_update(
+            index_elements=[ResourceVersion.resource], set_={"version": ResourceVersion.version + 1}
+        ).returning(ResourceVersion.resource, ResourceVersion.version)
+    )
+    session.info[COMMITTED_VERSIONS_KEY] = dict(committed.all())
+
+    message = {"origin": ORIGIN, "versions": session.info[COMMITTED_VERSIONS_KEY]}
+    session.execute(select(func.pg_notify(CHANNEL, orjson.dumps(message).decode())))
+
+
+@event.listens_for(Session, "after_commit")
+def record_versions(session: Session) -> None:
+    """Record the versions of the resources changed by a transaction that was committed."""
+    if committed := session.info.pop(COMMITTED_VERSIONS_KEY, None):
+        known_versions.update(committed)
+
+
+@event.listens_for(Session, "after_rollback")
+def forget_changes(session: Session) -> None:
+    """Forget the resources changed by a transaction that was rolled back."""
+    session.info.pop(CHANGED_RESOURCES_KEY, None)
+    session.info.pop(COMMITTED_VERSIONS_KEY, None)
+
+
+class VersionCache:
+    """
+    The versions of the resources known to this process.
+
+    They are updated by the transactions of this process as they commit, and by the notifications of the
+    other processes. They are only read from the database every `ttl` seconds, in case a notification was
+    missed, and whenever `expire` is called, such as when the listening connection is reestablished.
+    """
+
+    def __init__(self, ttl: float) -> None:
+        self.ttl = ttl
+        self._versions: dict[str, int] = {}
+        self._expires_at = 0.0
+
+    def update(self, versions: dict[str, int]) -> None:
+        """Record the given versions, unless newer ones are already known."""
+        for resource, version in versions.items():
+            self._versions[resource] = max(self._versions.get(resource, 0), version)
+
+    def expire(self) -> None:
+        """Read the versions from the database again the next time they are needed."""
+        self._expires_at = 0.0
+
+    def clear(self) -> None:
+        """Forget every known version."""
+        self._versions.clear()
+        self.expire()
+
+    async def get(self, session: AsyncSession, resources: frozenset[str]) -> dict[str, int]:
+        """Get the version of each of the given resources, reading them with `session` if they expired."""
+        if self._expires_at <= (now := time.monotonic()):
+            # Set first, so that concurrent requests don't all read them, and an `expire` meanwhile isn't lost.
+            self._expires_at = now + self.ttl
+            try:
+                rows = await session.execute(
+                    select(ResourceVersion.resource, ResourceVersion.version).where(
+                        ResourceVersion.resource.in_(RESOURCES)
+                    )
+                )
+            except BaseException:
+                self.expire()
+                raise
+
+            self.update(dict(rows.all()))
+
+        return {resource: self._versions.get(resource, 0) for resource in sorted(resources)}
+
+
+known_versions = VersionCache(Config.RESOURCE_VERSIONS_TTL)
+
+
+async def versions(session: AsyncSession, resources: frozenset[str]) -> dict[str, int]:
+    """Get the current version of each of the given resources, which is 0 until they are first changed."""
+    return await known_versions.get(session, resources)
+
+
+def receive(payload: str) -> None:
+    """Record the versions committed by another process, and notify the subscribers of the changed resources."""
+    try:
+        message = orjson.loads(payload)
+        committed = {resource: version for resource, version in message["versions"].items() if resource in RESOURCES}
+    except (orjson.JSONDecodeError, KeyError, TypeError, AttributeError):
+        log.warning(f"Ignoring a malformed change notification: {payload!r}")
+        return
+
+    if message.get("origin") != ORIGIN:
+        known_versions.update(committed)
+        notify(frozenset(committed))
+
+
+async def listen_until_closed(engine: AsyncEngine) -> None:
+    """Receive the changes published by the other processes until the listening connection is closed."""
+    async with engine.connect() as connection:
+        raw_connection = await connection.get_raw_connection()
+        driver_connection = raw_connection.driver_connection
+
+        closed = asyncio.Event()
+        driver_connection.add_termination_listener(lambda _connection: closed.set())
+        await driver_connection.add_listener(CHANNEL, lambda _connection, _pid, _channel, payload: receive(payload))
+        log.info(f"Listening for changes on the {CHANNEL!r} channel.")
+
+        # Notifications may have been missed while not listening.
+        known_versions.expire()
+        notify(RESOURCES)
+        await closed.wait()
+
+
+async def listen(engine: AsyncEngine) -> None:
+    """
+    Receive the changes published by the other processes until cancelled, reconnecting whenever needed.
+
+    The listening connection is held for as long as it's open, so `engine` shouldn't pool its connections.
+    """
+    while True:
+        try:
+            await listen_until_closed(engine)
+            log.warning("The connection listening for changes was closed.")
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            log.exception("Lost the connection listening for changes.")
+
+        await asyncio.sleep(RECONNECT_DELAY)
@@ -0,0 +1,165 @@
+"""
+Compression of response bodies, negotiated with the `Accept-Encoding` header of requests.
+
+`CompressionMiddleware` compresses the JSON and text bodies of at least `Config.COMPRESSION_MIN_SIZE`
+bytes, with brotli or gzip. Streamed responses are sent as they are, headers first, so that neither
+their headers nor their chunks are held back.
+
+Responses that are served many times, such as the cached ones or the archived code jams, keep their
+compressed variants alongside their body, see `compressed_variant`, and are sent already encoded.
+"""
+import gzip
+from typing import Any, Optional
+
+import brotli
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from api.constants import Config
+from api.streaming import NDJSON
+
+BROTLI = "br"
+GZIP = "gzip"
+# The supported encodings, in order of preference.
+ENCODINGS = (BROTLI, GZIP)
+COMPRESSIBLE_TYPES = ("application/json", "text/")
+STREAMED_TYPES = ("text/event-stream", NDJSON)
+# The variants of a `PrecompressedResponse` are stored under this key of the scope of its request.
+VARIANTS_KEY = "api.compressed_variants"
+# Favour speed over size, as most bodies are compressed for a single response.
+BROTLI_QUALITY = 5
+GZIP_LEVEL = 6
+
+
+class PrecompressedResponse(Response):
+    """A response whose body is also available compressed, with some of the supported encodings."""
+
+    def __init__(self, content: bytes, variants: dict[str, bytes], **kwargs: Any) -> None:
+        super().__init__(content, **kwargs)
+        self.variants = variants
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Send the response, handing its variants over to the `CompressionMiddleware`."""
+        scope[VARIANTS_KEY] = self.variants
+        await super().__call__(scope, receive, send)
+
+
+def negotiate(accept_encoding: str) -> Optional[str]:
+    """Get the preferred encoding accepted by an `Accept-Encoding` header, or None to send the body as it is."""
+    qualities = {}
+    for coding in accept_encoding.split(","):
+        name, _, parameters = coding.partition(";")
+        quality = 1.0
+
+        if (parameter := parameters.strip()).startswith("q="):
+            try:
+                quality = float(parameter.removeprefix("q="))
+            except ValueError:
+                quality = 0.0
+
+        qualities[name.strip().lower()] = quality
+
+    best, best_quality = None, 0.0
+    for encoding in ENCODINGS:
+        if (quality := qualities.get(encoding, qualities.get("*", 0.0))) > best_quality:
+            best, best_quality = encoding, quality
+
+    return best
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    """Compress a body with one of the supported encodings."""
+    if encoding == BROTLI:
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+def is_compressible(headers: Headers) -> bool:
+    """Whether a body with the given headers is worth compressing, which it isn't if it's already encoded."""
+    content_type = headers.get("content-type", "")
+    return "content-encoding" not in headers and content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+def is_streamed(headers: Headers) -> bool:
+    """Whether a response with the given headers is streamed, which only the responses without a length can be."""
+    return "content-length" not in headers or headers.get("content-type", "").startswith(STREAMED_TYPES)
+
+
+def add_vary(headers: MutableHeaders) -> None:
+    """Tell caches that the body depends on the `Accept-Encoding` header of the request."""
+    if "accept-encoding" not in headers.get("vary", "").lower():
+        headers.add_vary_header("Accept-Encoding")
+
+
+def encoded_etag(etag: str, encoding: str) -> str:
+    """Get the ETag of a body compressed with `encoding`, as strong ETags must differ between encodings."""
+    return f'{etag[:-1]}-{encoding}"'
+
+
+def compressed_variant(body: bytes, headers: Headers, encoding: str, variants: dict[str, bytes]) -> Optional[bytes]:
+    """
+    Get the body compressed with `encoding`, or None if it shouldn't be compressed.
+
+    Variants are taken from, and added to, `variants`, so that a body is only compressed once per encoding.
+    """
+    if len(body) < Config.COMPRESSION_MIN_SIZE or not is_compressible(headers):
+        return None
+
+    if encoding not in variants:
+        variants[encoding] = compress(body, encoding)
+
+    return variants[encoding]
+
+
+class CompressionMiddleware:
+    """Compresses the bodies of the responses that aren't streamed, with the encoding preferred by the client."""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Handle the request of `scope`, compressing its response if possible."""
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        start: Optional[Message] = None
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start
+
+            if message["type"] == "http.response.start":
+                # Streams are sent as they come, starting with their headers.
+                if is_streamed(Headers(raw=message["headers"])):
+                    await send(message)
+                else:
+                    start = message
+                return
+
+            if start is None:
+                await send(message)
+                return
+
+            headers = MutableHeaders(raw=list(start["headers"]))
+            body = message.get("body", b"")
+            # Precompressed responses come with some of their variants.
+            variants = scope.get(VARIANTS_KEY, {})
+
+            if encoding and (variant := compressed_variant(body, headers, encoding, variants)):
+                headers["Content-Encoding"] = encoding
+                headers["Content-Length"] = str(len(variant))
+                if "etag" in headers:
+                    headers["ETag"] = encoded_etag(headers["etag"], encoding)
+                add_vary(headers)
+                message = {**message, "body": variant}
+            elif is_compressible(headers):
+                add_vary(headers)
+
+            await send({**start, "headers": headers.raw})
+            start = None
+            await send(message)
+
+        await self.app(scope, receive, send_compressed)
@@ -7,6 +7,25 @@ class Config(NamedTuple):
     """Basic configuration for the Code Jam Management System."""
 
     DATABASE_URL = config("DATABASE_URL")
+    DATABASE_REPLICA_URL = config("DATABASE_REPLICA_URL", default=None)
+    DATABASE_POOL_SIZE = config("DATABASE_POOL_SIZE", cast=int, default=5)
+    DATABASE_MAX_OVERFLOW = config("DATABASE_MAX_OVERFLOW", cast=int, default=10)
+    DATABASE_POOL_TIMEOUT = config("DATABASE_POOL_TIMEOUT", cast=float, default=30.0)
+    DATABASE_POOL_RECYCLE = config("DATABASE_POOL_RECYCLE", cast=int, default=-1)
+    DATABASE_POOL_PRE_PING = config("DATABASE_POOL_PRE_PING", cast=bool, default=False)
+    DATABASE_STATEMENT_CACHE_SIZE = config("DATABASE_STATEMENT_CACHE_SIZE", cast=int, default=100)
     LOG_LEVEL = config("LOG_LEVEL", "INFO")
+    RESPONSE_CACHE_SIZE = config("RESPONSE_CACHE_SIZE", cast=int, default=1024)
+    RESPONSE_CACHE_TTL = config("RESPONSE_CACHE_TTL", cast=float, default=60.0)
+    LISTEN_FOR_CHANGES = config("LISTEN_FOR_CHANGES", cast=bool, default=True)
+    # The number of seconds the versions of the resources are kept in memory for, see `api.changes`.
+    RESOURCE_VERSIONS_TTL = config("RESOURCE_VERSIONS_TTL", cast=float, default=5.0)
+    COMPRESSION_MIN_SIZE = config("COMPRESSION_MIN_SIZE", cast=int, default=500)
+    # The number of seconds clients may cache the documents of archived code jams for.
+    ARCHIVE_MAX_AGE = config("ARCHIVE_MAX_AGE", cast=int, default=3600)
+    EVENTS_BUFFER_SIZE = config("EVENTS_BUFFER_SIZE", cast=int, default=100)
+    EVENTS_POLL_INTERVAL = config("EVENTS_POLL_INTERVAL", cast=float, default=5.0)
     DEBUG = config("DEBUG", cast=bool, default=False)
+    # Check the documents rendered without validation against their response model, see `api.documents`.
+    VALIDATE_RESPONSES = config("VALIDATE_RESPONSES", cast=bool, default=DEBUG)
     TOKEN = config("API_TOKEN", cast=str, default="badbot13m0n8f570f942013fc818f234916ca531")
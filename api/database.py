@@ -1,33 +1,154 @@
-from typing import Annotated
+from contextlib import contextmanager
+from typing import Annotated, Any, Callable, Iterator, Optional
 
 from fastapi import Depends
-from sqlalchemy import BigInteger, Boolean, Column, Enum, ForeignKey, Index, Integer, PrimaryKeyConstraint, Text, text
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy import (
+    BigInteger,
+    Boolean,
+    Column,
+    DateTime,
+    Enum,
+    ForeignKey,
+    Index,
+    Integer,
+    LargeBinary,
+    PrimaryKeyConstraint,
+    Sequence,
+    Text,
+    event,
+    func,
+    text,
+)
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship, sessionmaker
 
 from api.constants import Config
-from api.dependencies import get_db_session
-
-engine = create_async_engine(Config.DATABASE_URL)
+from api.dependencies import get_db_read_session, get_db_session
+from api.pool import InstrumentedPool
+
+
+def create_engine(url: str) -> AsyncEngine:
+    """Create an engine with the configured connection pool."""
+    return create_async_engine(
+        url,
+        poolclass=InstrumentedPool,
+        pool_size=Config.DATABASE_POOL_SIZE,
+        max_overflow=Config.DATABASE_MAX_OVERFLOW,
+        pool_timeout=Config.DATABASE_POOL_TIMEOUT,
+        pool_recycle=Config.DATABASE_POOL_RECYCLE,
+        pool_pre_ping=Config.DATABASE_POOL_PRE_PING,
+        connect_args={"prepared_statement_cache_size": Config.DATABASE_STATEMENT_CACHE_SIZE},
+    )
+
+
+engine = create_engine(Config.DATABASE_URL)
+# Without a replica, reads are served by the primary.
+replica_engine = create_engine(Config.DATABASE_REPLICA_URL) if Config.DATABASE_REPLICA_URL else engine
 Base = declarative_base()
 
+
+class ReadOnlySession(AsyncSession):
+    """
+    A session for routes that only read from the database.
+
+    Its connection is returned to the pool as soon as the results of each statement are fetched,
+    so that handlers don't hold on to a connection while they build their response.
+    The loaded objects are detached from the session, but keep their loaded attributes.
+
+    Statements are sent to the bind of the session, usually the replica, unless
+    `read_from_primary` is set, in which case they are sent to the `primary` bind.
+
+    Streamed results are read through a server-side cursor, which only lives within a transaction.
+    They hold on to their connection, in a read-only transaction, until the session is closed.
+    """
+
+    def __init__(self, bind: Optional[AsyncEngine] = None, *, primary: Optional[AsyncEngine] = None, **kw: Any):
+        super().__init__(bind, **kw)
+        self.primary = primary or bind
+        self.read_from_primary = False
+
+    def _bind_arguments(self) -> Optional[dict[str, Any]]:
+        """Get the arguments selecting the bind of the next statement."""
+        return {"bind": self.primary.sync_engine} if self.read_from_primary else None
+
+    async def execute(self, *args: Any, **kwargs: Any) -> Any:
+        """Execute a statement and release the connection of the session."""
+        kwargs.setdefault("bind_arguments", self._bind_arguments())
+
+        try:
+            return await super().execute(*args, **kwargs)
+        finally:
+            await self.close()
+
+    async def stream(self, *args: Any, **kwargs: Any) -> Any:
+        """Execute a statement and stream its results within a read-only transaction."""
+        bind_arguments = kwargs.setdefault("bind_arguments", self._bind_arguments())
+        await self.connection(
+            bind_arguments=bind_arguments,
+            execution_options={"isolation_level": "REPEATABLE READ", "postgresql_readonly": True},
+        )
+
+        return await super().stream(*args, **kwargs)
+
+
+@contextmanager
+def read_from_primary(session: AsyncSession) -> Iterator[None]:
+    """
+    Send the reads of `session` to the primary while the context is active.
+
+    This is the escape hatch for reads that must see writes the replica may not have replayed yet.
+    Sessions used for writes are always on the primary, so they are left as they are.
+    """
+    if not isinstance(session, ReadOnlySession) or session.read_from_primary:
+        yield
+        return
+
+    session.read_from_primary = True
+    try:
+        yield
+    finally:
+        session.read_from_primary = False
+
+
 Session = sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+# Reads run in autocommit mode, which spares the BEGIN and COMMIT round trips of a transaction.
+ReadSession = sessionmaker(
+    replica_engine.execution_options(isolation_level="AUTOCOMMIT"),
+    expire_on_commit=False,
+    class_=ReadOnlySession,
+    primary=engine.execution_options(isolation_level="AUTOCOMMIT"),
+)
 DBSession = Annotated[AsyncSession, Depends(get_db_session)]
+DBReadSession = Annotated[AsyncSession, Depends(get_db_read_session)]
+
+
+def on_commit(session: AsyncSession, callback: Callable[[], None]) -> None:
+    """Call `callback` once the current transaction of the session has been committed."""
+    event.listen(session.sync_session, "after_commit", lambda _session: callback(), once=True)
+
+
+def on_rollback(session: AsyncSession, callback: Callable[[], None]) -> None:
+    """Call `callback` once the current transaction of the session has been rolled back."""
+    event.listen(session.sync_session, "after_rollback", lambda _session: callback(), once=True)
 
 
 class TeamUser(Base):
     """A user who belongs to a team."""
 
     __tablename__ = "team_has_user"
-    __table_args__ = (PrimaryKeyConstraint("team_id", "user_id"),)
+    __table_args__ = (
+        PrimaryKeyConstraint("team_id", "user_id"),
+        Index("ix_team_has_user_user_id", "user_id", "team_id", postgresql_include=["is_leader"]),
+    )
 
     team_id = Column(ForeignKey("teams.id"), nullable=False)
     user_id = Column(ForeignKey("users.id"), nullable=False)
     is_leader = Column(Boolean, nullable=False)
 
-    team = relationship("Team", back_populates="users", lazy="joined")
-    user = relationship("User", back_populates="teams", lazy="joined")
+    team = relationship("Team", back_populates="users", lazy="raise")
+    user = relationship("User", back_populates="teams", lazy="raise")
 
 
 class User(Base):
@@ -37,7 +158,7 @@ class User(Base):
 
     id = Column(BigInteger, primary_key=True, autoincrement=False)
 
-    teams = relationship("TeamUser", back_populates="user", lazy="joined")
+    teams = relationship("TeamUser", back_populates="user", lazy="raise")
 
 
 class Jam(Base):
@@ -49,9 +170,11 @@ class Jam(Base):
     name = Column(Text, nullable=False)
     ongoing = Column(Boolean, nullable=False, server_default="false")
 
-    teams = relationship("Team", back_populates="jam", lazy="joined")
-    winners = relationship("Winner", back_populates="jam", lazy="joined")
-    infractions = relationship("Infraction", back_populates="jam", lazy="joined")
+    teams = relationship("Team", back_populates="jam", lazy="raise")
+    winners = relationship("Winner", back_populates="jam", lazy="raise")
+    infractions = relationship("Infraction", back_populates="jam", lazy="raise")
+
+    __table_args__ = (Index("ix_jams_ongoing", "id", postgresql_where=text("ongoing")),)
 
 
 class Team(Base):
@@ -65,23 +188,29 @@ class Team(Base):
     discord_role_id = Column(BigInteger, nullable=True)
     discord_channel_id = Column(BigInteger, nullable=True)
 
-    jam = relationship("Jam", back_populates="teams", lazy="joined")
-    users = relationship("TeamUser", back_populates="team", lazy="joined")
+    jam = relationship("Jam", back_populates="teams", lazy="raise")
+    users = relationship("TeamUser", back_populates="team", lazy="raise")
 
-    __table_args__ = (Index("team_name_jam_unique", text("lower(name)"), "jam_id", unique=True),)
+    __table_args__ = (
+        Index("team_name_jam_unique", text("lower(name)"), "jam_id", unique=True),
+        Index("ix_teams_jam_id", "jam_id"),
+    )
 
 
 class Winner(Base):
     """A user who has won a code jam."""
 
     __tablename__ = "winners"
-    __table_args__ = (PrimaryKeyConstraint("jam_id", "user_id"),)
+    __table_args__ = (
+        PrimaryKeyConstraint("jam_id", "user_id"),
+        Index("ix_winners_user_id", "user_id"),
+    )
 
     jam_id = Column(ForeignKey("jams.id"), nullable=False)
     user_id = Column(ForeignKey("users.id"), nullable=False)
     first_place = Column(Boolean, nullable=False)
 
-    jam = relationship("Jam", back_populates="winners", lazy="joined")
+    jam = relationship("Jam", back_populates="winners", lazy="raise")
 
 
 class Infraction(Base):
@@ -95,5 +224,55 @@ class Infraction(Base):
     infraction_type = Column(Enum("note", "ban", "warning", name="infraction_type"), nullable=False)
     reason = Column(Text, nullable=False)
 
-    user = relationship("User", lazy="joined")
-    jam = relationship("Jam", back_populates="infractions", lazy="joined")
+    user = relationship("User", lazy="raise")
+    jam = relationship("Jam", back_populates="infractions", lazy="raise")
+
+    __table_args__ = (
+        Index("ix_infractions_user_id_jam_id", "user_id", "jam_id"),
+        Index("ix_infractions_jam_id", "jam_id"),
+    )
+
+
+class ResourceVersion(Base):
+    """A counter of the changes made to a resource of the API, such as its code jams."""
+
+    __tablename__ = "resource_versions"
+
+    resource = Column(Text, primary_key=True)
+    version = Column(BigInteger, nullable=False)
+
+
+class Change(Base):
+    """A change published by a write route, in the append-only log read by sync clients."""
+
+    __tablename__ = "changes"
+    __table_args__ = (
+        Index("ix_changes_transaction_id_id", "transaction_id", "id"),
+        Index("ix_changes_position_id", "position", "id"),
+    )
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    # The ID of the transaction which made the change, to find the changes to position when it commits.
+    transaction_id = Column(BigInteger, nullable=False, server_default=func.txid_current())
+    # The position of the change in the log, taken from `change_positions` right before its transaction commits.
+    position = Column(BigInteger)
+    changed_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    resources = Column(ARRAY(Text), nullable=False)
+    jam_id = Column(Integer)
+    team_id = Column(Integer)
+    user_id = Column(BigInteger)
+
+
+# Positions are taken by one committing transaction at a time, so that they follow the order of the commits.
+change_positions = Sequence("change_positions", metadata=Base.metadata)
+
+
+class ArchivedJam(Base):
+    """The frozen document of a finished code jam, see `api.archive`."""
+
+    __tablename__ = "archived_jams"
+
+    jam_id = Column(ForeignKey("jams.id"), primary_key=True)
+    archived_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    # The gzip compressed JSON document of the jam.
+    document = Column(LargeBinary, nullable=False)
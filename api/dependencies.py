@@ -1,12 +1,40 @@
 from typing import AsyncGenerator
 
+from fastapi import Request
 from sqlalchemy.ext.asyncio import AsyncSession
 
 import api.database as db
 
+# Clients that just made a change can send this header to read it back from the primary,
+# instead of the replica which may not have replayed it yet.
+READ_PRIMARY_HEADER = "X-Read-Primary"
+# Requests dispatched by a batch carry the session of the batch under this key of their scope.
+BATCH_SESSION_KEY = "api.batch_session"
 
-async def get_db_session() -> AsyncGenerator[AsyncSession, None]:
+
+def reads_from_primary(request: Request) -> bool:
+    """Whether the request asks to read from the primary, with its `READ_PRIMARY_HEADER` header."""
+    return request.headers.get(READ_PRIMARY_HEADER, "").lower() in ("1", "true")
+
+
+async def get_db_session(request: Request) -> AsyncGenerator[AsyncSession, None]:
     """A dependency to pass a database session to every route function."""
+    if (batch_session := request.scope.get(BATCH_SESSION_KEY)) is not None:
+        yield batch_session
+        return
+
     async with db.Session() as session:
         async with session.begin():
             yield session
+
+
+async def get_db_read_session(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    """A dependency to pass a read-only database session, without a transaction, to routes that only read."""
+    # The operations of a batch read what the previous ones wrote.
+    if (batch_session := request.scope.get(BATCH_SESSION_KEY)) is not None:
+        yield batch_session
+        return
+
+    async with db.ReadSession() as session:
+        session.read_from_primary = reads_from_primary(request)
+        yield session
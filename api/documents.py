@@ -0,0 +1,252 @@
+"""
+Response documents built from database rows, and the trusted rendering of them.
+
+Routes return these documents as they are, instead of loading ORM objects and validating each
+of them through the `orm_mode` of its response model, which is where most of the time of those
+routes went. Each document has the fields of its response model, in the same order, so the
+response models still describe them.
+
+Only documents built by this module may skip the validation of the response model through
+`render`: their values come from columns whose types and constraints match the fields of the
+models. Data read from requests must go through a model. With `Config.VALIDATE_RESPONSES`,
+which defaults to `Config.DEBUG`, every rendered document is checked against its model, so
+that the tests catch any document drifting from its model.
+
+The `stream_*` variants read their rows through a server-side cursor and yield each document
+as soon as its rows were read, so that exporting a whole table doesn't load it in memory.
+"""
+from collections import defaultdict
+from typing import Any, AsyncIterator, Optional
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import ORJSONResponse
+from pydantic import parse_obj_as
+from sqlalchemy import tuple_
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy.sql import ColumnElement
+
+from api.constants import Config
+from api.database import Change, Infraction, Jam, Team, TeamUser, Winner
+
+Document = dict[str, Any]
+# The position of a change in the log, then its own ID.
+ChangeKey = tuple[int, int]
+
+
+async def team_documents(session: AsyncSession, where: Optional[ColumnElement] = None) -> list[Document]:
+    """Get the teams matching the `where` clause, or every team, along with their users, ordered by ID."""
+    teams_query = select(Team.__table__).order_by(Team.id)
+    users_query = select(TeamUser.team_id, TeamUser.user_id, TeamUser.is_leader).order_by(TeamUser.user_id)
+
+    if where is not None:
+        teams_query = teams_query.where(where)
+        users_query = users_query.join_from(TeamUser, Team).where(where)
+
+    teams = await session.execute(teams_query)
+    team_users = await session.execute(users_query)
+
+    users_by_team = defaultdict(list)
+    for team_user in team_users.all():
+        users_by_team[team_user.team_id].append(user_document(team_user))
+
+    return [team_document(team, users_by_team[team.id]) for team in teams.all()]
+
+
+async def stream_team_documents(
+    session: AsyncSession, where: Optional[ColumnElement] = None
+) -> AsyncIterator[Document]:
+    """Stream the teams matching the `where` clause, or every team, along with their users, ordered by ID."""
+    # Each team is repeated once per user, and appears once with empty user columns if it has none.
+    query = (
+        select(Team.__table__, TeamUser.user_id, TeamUser.is_leader)
+        .join_from(Team, TeamUser, isouter=True)
+        .order_by(Team.id, TeamUser.user_id)
+    )
+
+    if where is not None:
+        query = query.where(where)
+
+    team, users = None, []
+    async for row in await session.stream(query):
+        if team is not None and row.id != team.id:
+            yield team_document(team, users)
+            users = []
+
+        team = row
+        if row.user_id is not None:
+            users.append(user_document(row))
+
+    if team is not None:
+        yield team_document(team, users)
+
+
+def team_document(team: Row, users: list[Document]) -> Document:
+    """Build the document of a team row with the given users."""
+    return {
+        "name": team.name,
+        "users": users,
+        "discord_role_id": team.discord_role_id,
+        "discord_channel_id": team.discord_channel_id,
+        "id": team.id,
+        "jam_id": team.jam_id,
+    }
+
+
+async def infraction_documents(session: AsyncSession, where: Optional[ColumnElement] = None) -> list[Document]:
+    """Get the infractions matching the `where` clause, or every infraction, ordered by ID."""
+    query = select(Infraction.__table__).order_by(Infraction.id)
+
+    if where is not None:
+        query = query.where(where)
+
+    infractions = await session.execute(query)
+
+    return [infraction_document(infraction) for infraction in infractions.all()]
+
+
+async def stream_infraction_documents(session: AsyncSession) -> AsyncIterator[Document]:
+    """Stream every infraction, ordered by ID."""
+    async for infraction in await session.stream(select(Infraction.__table__).order_by(Infraction.id)):
+        yield infraction_document(infraction)
+
+
+def user_document(team_user: Row) -> Document:
+    """Build the document of a team member row."""
+    return {"user_id": team_user.user_id, "is_leader": team_user.is_leader}
+
+
+def member_document(user_id: int, team: Document, is_leader: bool) -> Document:
+    """Build the document of the membership of a user in a team."""
+    return {"user_id": user_id, "team": team, "is_leader": is_leader}
+
+
+def participation_document(membership: Row, infractions: list[Document]) -> Document:
+    """Build the participation history entry of a team membership row joined with its winner entry."""
+    return {
+        "jam_id": membership.jam_id,
+        "top_10": membership.first_place is not None,
+        "first_place": bool(membership.first_place),
+        "team_id": membership.team_id,
+        "is_leader": membership.is_leader,
+        "infractions": infractions,
+    }
+
+
+def add_participation_row(participation_history: dict[int, Document], row: Row) -> None:
+    """
+    Add a membership row, joined with its winner entry and one of its infractions, to the participation history.
+
+    The row is also read as the infraction row, whose ID is None if there is none, see `infraction_document`.
+    """
+    if row.team_id not in participation_history:
+        participation_history[row.team_id] = participation_document(row, [])
+
+    if row.id is not None:
+        participation_history[row.team_id]["infractions"].append(infraction_document(row))
+
+
+def participant_document(user_id: int, participation_history: list[Document]) -> Document:
+    """Build the document of a user with the given participation history."""
+    return {"id": user_id, "participation_history": participation_history}
+
+
+def winner_document(winner: Row) -> Document:
+    """Build the document of a winner row."""
+    return {"user_id": winner.user_id, "first_place": winner.first_place, "jam_id": winner.jam_id}
+
+
+def infraction_document(infraction: Row) -> Document:
+    """Build the document of an infraction row."""
+    return {
+        "user_id": infraction.user_id,
+        "jam_id": infraction.jam_id,
+        "reason": infraction.reason,
+        "infraction_type": infraction.infraction_type,
+        "id": infraction.id,
+    }
+
+
+async def codejam_document(session: AsyncSession, jam_id: int) -> Optional[Document]:
+    """Get the specified code jam along with its teams, winners and infractions, or None if it doesn't exist."""
+    jams = await session.execute(select(Jam.__table__).where(Jam.id == jam_id))
+
+    if not (jam := jams.first()):
+        return None
+
+    winners = await session.execute(select(Winner.user_id, Winner.first_place).where(Winner.jam_id == jam_id))
+
+    return {
+        "name": jam.name,
+        "teams": await team_documents(session, Team.jam_id == jam_id),
+        "ongoing": jam.ongoing,
+        "id": jam.id,
+        "infractions": await infraction_documents(session, Infraction.jam_id == jam_id),
+        "winners": [{"user_id": user_id, "first_place": first_place} for user_id, first_place in winners.all()],
+    }
+
+
+def committed_changes() -> ColumnElement:
+    """
+    Get the clause matching the changes that can be listed, as no earlier change can be committed after them.
+
+    Change IDs are taken in the order changes are made, not committed, so a change with a lower ID may
+    still be committed after a later one was listed. Changes are ordered by their position instead,
+    which is only set right before their transaction commits, one transaction at a time, see
+    `api.changes.commit_changes`. Once a position is visible, so are all the earlier ones.
+    """
+    return Change.position.is_not(None)
+
+
+async def change_documents(
+    session: AsyncSession, after: Optional[ChangeKey], limit: int
+) -> list[tuple[ChangeKey, Document]]:
+    """Get the first `limit` changes following the `after` key, or the first ones, along with their key."""
+    query = select(Change.__table__).where(committed_changes())
+
+    if after is not None:
+        query = query.where(tuple_(Change.position, Change.id) > tuple_(*after))
+
+    changes = await session.execute(query.order_by(Change.position, Change.id).limit(limit))
+
+    return [((change.position, change.id), change_document(change)) for change in changes.all()]
+
+
+async def last_change_key(session: AsyncSession) -> ChangeKey:
+    """Get the key of the last change that can be listed, or (0, 0) if there are none."""
+    query = (
+        select(Change.position, Change.id)
+        .where(committed_changes())
+        .order_by(Change.position.desc(), Change.id.desc())
+        .limit(1)
+    )
+    last = (await session.execute(query)).first()
+
+    return tuple(last) if last else (0, 0)
+
+
+def change_document(change: Row) -> Document:
+    """Build the document of a change row."""
+    return {
+        "id": change.id,
+        "changed_at": change.changed_at,
+        "resources": change.resources,
+        "jam_id": change.jam_id,
+        "team_id": change.team_id,
+        "user_id": change.user_id,
+    }
+
+
+def render(document: Any, model: Any, status_code: int = 200) -> ORJSONResponse:
+    """
+    Render a document built by this module as a response described by `model`, without validating it.
+
+    With `Config.VALIDATE_RESPONSES`, the document must be exactly what validating it would produce.
+    """
+    if Config.VALIDATE_RESPONSES:
+        validated = jsonable_encoder(parse_obj_as(model, document))
+        if validated != jsonable_encoder(document):
+            raise ValueError(f"The document doesn't match {model}:\n{document}\nValidated:\n{validated}")
+
+    return ORJSONResponse(document, status_code=status_code)
@@ -0,0 +1,141 @@
+"""
+Server-Sent Events of the changes made to the resources of the API.
+
+A single `Broadcaster` per process reads the new changes of the change log whenever a change is
+published, by this process or another one, and sends them to every connected client. Changes are
+also read every `Config.EVENTS_POLL_INTERVAL` seconds, in case the notification of a change was lost.
+
+Each client has a queue of at most `Config.EVENTS_BUFFER_SIZE` events. Clients that don't keep up
+are disconnected rather than buffered, and can resume from the change log by reconnecting with the
+`Last-Event-ID` of the last event they received, as for any disconnection.
+"""
+import asyncio
+import logging
+from typing import AsyncIterator, Optional
+
+import orjson
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api import changes
+from api.constants import Config
+from api.database import ReadSession
+from api.documents import ChangeKey, Document, change_documents, last_change_key
+from api.pagination import encode_cursor
+
+EVENT_STREAM = "text/event-stream"
+# The number of seconds after which an idle stream gets a comment, so that proxies don't close it.
+KEEPALIVE_INTERVAL = 15.0
+# The number of changes read from the change log with each query.
+FETCH_SIZE = 1000
+
+# A change and its key, or None when the client was disconnected for not keeping up.
+Message = Optional[tuple[ChangeKey, bytes]]
+
+log = logging.getLogger(__name__)
+
+
+def format_event(key: ChangeKey, change: Document) -> bytes:
+    """Format a change as an event, with its cursor in the change log as its ID."""
+    return b"id: %s\nevent: change\ndata: %s\n\n" % (encode_cursor(*key).encode(), orjson.dumps(change))
+
+
+class Broadcaster:
+    """Sends the changes of the change log to every connected client."""
+
+    def __init__(self, buffer_size: int) -> None:
+        self.buffer_size = buffer_size
+        self.changed = asyncio.Event()
+        self.last_key: Optional[ChangeKey] = None
+        self._queues: set[asyncio.Queue[Message]] = set()
+
+    def connect(self) -> asyncio.Queue[Message]:
+        """Get the queue of the events of a new client."""
+        queue = asyncio.Queue(self.buffer_size)
+        self._queues.add(queue)
+        return queue
+
+    def disconnect(self, queue: asyncio.Queue[Message]) -> None:
+        """Stop sending events to the client of `queue`."""
+        self._queues.discard(queue)
+
+    def broadcast(self, key: ChangeKey, change: Document) -> None:
+        """Send a change to every client, disconnecting those whose queue is full."""
+        message = (key, format_event(key, change))
+
+        for queue in list(self._queues):
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                self.disconnect(queue)
+                # The events left are dropped to tell the client it's disconnected, it will get them again on resuming.
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+
+    async def fetch(self, session: AsyncSession) -> None:
+        """Broadcast the changes that followed the last broadcast one."""
+        if self.last_key is None:
+            self.last_key = await last_change_key(session)
+            return
+
+        while True:
+            new_changes = await change_documents(session, self.last_key, FETCH_SIZE)
+
+            for key, change in new_changes:
+                self.broadcast(key, change)
+                self.last_key = key
+
+            if len(new_changes) < FETCH_SIZE:
+                return
+
+    async def stream(self, session: AsyncSession, last_key: Optional[ChangeKey]) -> AsyncIterator[bytes]:
+        """Connect a client and stream its events, starting with the changes that followed `last_key` if given."""
+        # The client is connected before catching up, so that no change is missed in between.
+        queue = self.connect()
+
+        try:
+            while last_key is not None:
+                missed_changes = await change_documents(session, last_key, FETCH_SIZE)
+
+                for key, change in missed_changes:
+                    yield format_event(key, change)
+                    last_key = key
+
+                if len(missed_changes) < FETCH_SIZE:
+                    break
+
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), KEEPALIVE_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield b": keepalive\n\n"
+                    continue
+
+                if message is None:
+                    return
+
+                key, event = message
+                # Changes already sent while catching up are skipped.
+                if last_key is None or key > last_key:
+                    yield event
+        finally:
+            self.disconnect(queue)
+
+    async def run(self) -> None:
+        """Broadcast the new changes whenever some are published, and regularly, until cancelled."""
+        while True:
+            try:
+                async with ReadSession() as session:
+                    await self.fetch(session)
+            except Exception:
+                log.exception("Could not read the new changes to broadcast.")
+
+            try:
+                await asyncio.wait_for(self.changed.wait(), Config.EVENTS_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self.changed.clear()
+
+
+broadcaster = Broadcaster(Config.EVENTS_BUFFER_SIZE)
+changes.subscribe(lambda _resources: broadcaster.changed.set())
@@ -1,11 +1,20 @@
+import asyncio
+from typing import Optional
+
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
 from starlette.middleware.authentication import AuthenticationMiddleware
 
+from api import changes
+from api.compression import CompressionMiddleware
 from api.constants import Config
+from api.events import broadcaster
 from api.middleware import TokenAuthentication, on_auth_error
-from api.routers import codejams, infractions, teams, users, winners
+from api.routers import batch, codejams, events, feed, infractions, internal, teams, users, winners
 
-app = FastAPI(redoc_url="/", docs_url="/swagger")
+app = FastAPI(redoc_url="/", docs_url="/swagger", default_response_class=ORJSONResponse)
 
 app.add_middleware(
     AuthenticationMiddleware,
@@ -13,8 +22,45 @@ app.add_middleware(
     on_error=on_auth_error,
 )
 
+# Added last to compress the responses of every other middleware.
+app.add_middleware(CompressionMiddleware)
+
+app.include_router(batch.router)
 app.include_router(codejams.router)
+app.include_router(events.router)
+app.include_router(feed.router)
 app.include_router(infractions.router)
+app.include_router(internal.router)
 app.include_router(teams.router)
 app.include_router(users.router)
 app.include_router(winners.router)
+
+change_listener: Optional[asyncio.Task] = None
+event_broadcaster: Optional[asyncio.Task] = None
+
+
+@app.on_event("startup")
+async def start_change_listener() -> None:
+    """Listen for the changes made by the other processes of the API, to keep the caches of this one fresh."""
+    global change_listener
+
+    if Config.LISTEN_FOR_CHANGES:
+        # The listening connection is held by the listener, and closed along with it.
+        listener_engine = create_async_engine(Config.DATABASE_URL, poolclass=NullPool)
+        change_listener = asyncio.create_task(changes.listen(listener_engine))
+
+
+@app.on_event("startup")
+async def start_event_broadcaster() -> None:
+    """Send the changes to the clients of the event stream."""
+    global event_broadcaster
+
+    event_broadcaster = asyncio.create_task(broadcaster.run())
+
+
+@app.on_event("shutdown")
+async def stop_background_tasks() -> None:
+    """Stop listening for changes and broadcasting them."""
+    for task in (change_listener, event_broadcaster):
+        if task is not None:
+            task.cancel()
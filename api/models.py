@@ -1,5 +1,6 @@
+from datetime import datetime
 from enum import Enum
-from typing import Optional
+from typing import Any, Optional
 
 from pydantic import BaseModel
 
@@ -133,6 +134,124 @@ class CodeJamResponse(CodeJam):
         orm_mode = True
 
 
+class CodeJamSnapshot(BaseModel):
+    """Response model representing the ongoing code jam, with its teams and the team of each participant."""
+
+    id: int
+    name: str
+    teams: list[TeamResponse]
+    # The ID of the team of each participant, by their ID.
+    members: dict[int, int]
+
+
+class CodeJamSummary(BaseModel):
+    """Response model representing a code jam without its teams, infractions and winners."""
+
+    id: int
+    name: str
+    ongoing: bool
+    team_count: int
+    user_count: int
+    infraction_count: int
+
+    class Config:
+        """Sets ORM mode to true so that pydantic will validate the objects returned by SQLAlchemy."""
+
+        orm_mode = True
+
+
+class CodeJamPage(BaseModel):
+    """Response model representing a page of code jams, newest first."""
+
+    codejams: list[CodeJamSummary]
+    next_cursor: Optional[str] = None
+
+
+class ChangeEvent(BaseModel):
+    """Response model representing a change made to the resources of the API."""
+
+    id: int
+    changed_at: datetime
+    resources: list[str]
+    jam_id: Optional[int] = None
+    team_id: Optional[int] = None
+    user_id: Optional[int] = None
+
+
+class ChangePage(BaseModel):
+    """Response model representing the changes following a cursor, in the order they were committed."""
+
+    changes: list[ChangeEvent]
+    cursor: str
+    has_more: bool
+
+
+class TeamImportError(BaseModel):
+    """A model representing a team of an upload that could not be imported."""
+
+    line: int
+    detail: str
+
+
+class TeamImportResponse(BaseModel):
+    """Response model representing the outcome of a team upload."""
+
+    created: list[int]
+    errors: list[TeamImportError]
+
+
+class BatchOperation(BaseModel):
+    """A model representing a request to run as an operation of a batch."""
+
+    method: str
+    # The path of the request, along with its query string if any.
+    path: str
+    body: Any = None
+
+
+class BatchResult(BaseModel):
+    """A model representing the response to an operation of a batch."""
+
+    status_code: int
+    body: Any = None
+
+
+class BatchResponse(BaseModel):
+    """Response model representing the outcome of a batch, whose operations are committed together or not at all."""
+
+    committed: bool
+    results: list[BatchResult]
+
+
+class HistogramBucket(BaseModel):
+    """A model representing a bucket of a histogram."""
+
+    # The inclusive upper bound of the bucket, or None for the bucket of values above every other bound.
+    le: Optional[float]
+    count: int
+
+
+class Histogram(BaseModel):
+    """A model representing a histogram of how long connection checkouts took, in seconds."""
+
+    buckets: list[HistogramBucket]
+    count: int
+    sum: float
+    timeouts: int
+
+
+class PoolStatistics(BaseModel):
+    """Response model representing the usage of a database connection pool."""
+
+    name: str
+    size: int
+    checked_in: int
+    checked_out: int
+    overflow: int
+    max_overflow: int
+    wait_time: Histogram
+
+
 class UserTeamResponse(BaseModel):
     """Response model representing user and team relationship."""
 
@@ -0,0 +1,176 @@
+"""In-process caches of the ongoing code jam, which only changes a couple of times a year."""
+from typing import Any, Awaitable, Callable, NamedTuple, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from api import changes
+from api.database import Jam, Team, on_commit, on_rollback, read_from_primary
+from api.documents import Document, member_document, render, team_documents
+from api.models import CodeJamSnapshot
+
+_UNSET = object()
+
+
+class OngoingJam(NamedTuple):
+    """The identity of the ongoing code jam."""
+
+    id: int
+    name: str
+
+
+class InvalidatedCache:
+    """
+    A value loaded lazily from the database and dropped whenever a write could have changed it.
+
+    Values are loaded from the primary, as reloading from a lagging replica right after an
+    invalidation would cache the state from before the write until the next invalidation.
+
+    The versions of the `resources` the value is built from are loaded along with it, so that it can
+    be dropped by `refresh` when newer versions are read, should the notification of a change made
+    by another process be late or lost.
+    """
+
+    def __init__(self, *resources: str) -> None:
+        self.resources = frozenset(resources)
+        self._value = _UNSET
+        self._versions: dict[str, int] = {}
+        # Bumped on every invalidation, so that a load racing with a write doesn't store a stale result.
+        self._generation = 0
+
+    async def _get(
+        self,
+        session: AsyncSession,
+        load: Callable[[], Awaitable[Any]],
+        is_current: Optional[Callable[[Any], bool]] = None,
+    ) -> Any:
+        """Return the cached value, unless `is_current` rejects it, otherwise `load` it with `session` and cache it."""
+        if self._value is not _UNSET and (is_current is None or is_current(self._value)):
+            return self._value
+
+        generation = self._generation
+        with read_from_primary(session):
+            # Read first, so that a change committed in between makes the versions older than the value.
+            versions = await changes.versions(session, self.resources)
+            value = await load()
+
+        # Values read by a transaction that changed resources may have been built from its uncommitted changes.
+        if generation == self._generation and not session.info.get(changes.CHANGED_RESOURCES_KEY):
+            self._value, self._versions = value, versions
+
+        return value
+
+    def refresh(self, versions: dict[str, int]) -> None:
+        """Drop the cached value if any of the given versions of its resources is newer than it was built from."""
+        if any(versions[resource] > self._versions.get(resource, 0) for resource in self.resources & versions.keys()):
+            self.invalidate()
+
+    def invalidate(self, session: Optional[AsyncSession] = None) -> None:
+        """
+        Drop the cached value.
+
+        When the session making the changes is given, the cache is invalidated again once
+        its transaction ends, as other requests may have cached the state from before the
+        commit, or the changes before the rollback, in the meantime.
+        """
+        self._value = _UNSET
+        self._generation += 1
+
+        if session is not None:
+            on_commit(session, self.invalidate)
+            on_rollback(session, self.invalidate)
+
+
+class OngoingJamCache(InvalidatedCache):
+    """Cache of the ongoing code jam, including whether there is none."""
+
+    async def get(self, session: AsyncSession) -> Optional[OngoingJam]:
+        """Get the ongoing code jam, or None if there is no ongoing code jam."""
+
+        async def load() -> Optional[OngoingJam]:
+            ongoing_jams = await session.execute(select(Jam.id, Jam.name).where(Jam.ongoing == True).order_by(Jam.id))
+            # With the current implementation, there should only be one ongoing codejam.
+            jam = ongoing_jams.first()
+            return OngoingJam(*jam) if jam else None
+
+        return await self._get(session, load)
+
+
+class Roster(NamedTuple):
+    """The teams of a code jam, indexed by the IDs of their members."""
+
+    jam_id: int
+    # The document of the current team of each member, see `member_document`.
+    members: dict[int, Document]
+
+
+class RosterCache(InvalidatedCache):
+    """Cache of the team of every participant of the ongoing code jam."""
+
+    async def get(self, session: AsyncSession, jam_id: int) -> Roster:
+        """Get the roster of the specified code jam, which should be the ongoing one."""
+
+        async def load() -> Roster:
+            members = {}
+
+            # Teams are ordered by ID, and users on several teams of the jam get the first of them.
+            for team in await team_documents(session, Team.jam_id == jam_id):
+                for user in team["users"]:
+                    if user["user_id"] not in members:
+                        members[user["user_id"]] = member_document(user["user_id"], team, user["is_leader"])
+
+            return Roster(jam_id, members)
+
+        return await self._get(session, load, is_current=lambda roster: roster.jam_id == jam_id)
+
+
+class Snapshot(NamedTuple):
+    """The serialized snapshot of a code jam."""
+
+    jam_id: int
+    content: bytes
+
+
+class SnapshotCache(InvalidatedCache):
+    """Cache of the serialized snapshot of the ongoing code jam, see `CodeJamSnapshot`."""
+
+    async def get(self, session: AsyncSession, jam: OngoingJam) -> bytes:
+        """Get the snapshot of the specified code jam, which should be the ongoing one, serialized as JSON."""
+
+        async def load() -> Snapshot:
+            teams = await team_documents(session, Team.jam_id == jam.id)
+            members = {}
+
+            # As in the roster, users on several teams of the jam get the first of them.
+            for team in teams:
+                for user in team["users"]:
+                    members.setdefault(user["user_id"], team["id"])
+
+            document = {"id": jam.id, "name": jam.name, "teams": teams, "members": members}
+            return Snapshot(jam.id, render(document, CodeJamSnapshot).body)
+
+        snapshot = await self._get(session, load, is_current=lambda snapshot: snapshot.jam_id == jam.id)
+        return snapshot.content
+
+
+ongoing_jam = OngoingJamCache(changes.CODEJAMS)
+# Rosters are only used for the ongoing jam, which is checked by their `is_current`.
+ongoing_roster = RosterCache(changes.TEAMS)
+ongoing_snapshot = SnapshotCache(changes.CODEJAMS, changes.TEAMS)
+ONGOING_CACHES = (ongoing_jam, ongoing_roster, ongoing_snapshot)
+
+
+def invalidate_ongoing(resources: frozenset[str]) -> None:
+    """Drop the caches built from any of the changed resources."""
+    for cache in ONGOING_CACHES:
+        if cache.resources & resources:
+            cache.invalidate()
+
+
+def refresh_ongoing(versions: dict[str, int]) -> None:
+    """Drop the caches built from older versions of their resources than the given ones, see `InvalidatedCache`."""
+    for cache in ONGOING_CACHES:
+        cache.refresh(versions)
+
+
+changes.subscribe(invalidate_ongoing)
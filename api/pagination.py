@@ -0,0 +1,28 @@
+"""Opaque cursors for keyset paginated listings."""
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from fastapi import HTTPException
+
+
+def encode_cursor(*key: int) -> str:
+    """Encode the key of the last returned row, made of one or more columns, into a cursor for the next page."""
+    return urlsafe_b64encode(".".join(map(str, key)).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> int:
+    """Decode a cursor produced by `encode_cursor` back into the key it was created from."""
+    (key,) = decode_composite_cursor(cursor, 1)
+    return key
+
+
+def decode_composite_cursor(cursor: str, length: int) -> tuple[int, ...]:
+    """Decode a cursor produced by `encode_cursor` from a key of `length` columns."""
+    try:
+        key = tuple(int(part) for part in urlsafe_b64decode(cursor.encode()).split(b"."))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor.")
+
+    if len(key) != length:
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor.")
+
+    return key
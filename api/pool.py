@@ -0,0 +1,82 @@
+"""Connection pool instrumentation."""
+import time
+from typing import Optional
+
+from sqlalchemy.exc import TimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from api.models import Histogram, HistogramBucket, PoolStatistics
+
+# Upper bounds, in seconds, of the buckets of the connection wait time histogram.
+WAIT_TIME_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class WaitTimes:
+    """A histogram of how long connection checkouts took."""
+
+    def __init__(self, bounds: tuple[float, ...] = WAIT_TIME_BUCKETS) -> None:
+        self.bounds = bounds
+        # One count per bound, and a last one for the checkouts that took longer than every bound.
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0.0
+        self.timeouts = 0
+
+    def observe(self, seconds: float) -> None:
+        """Record a checkout that took `seconds`."""
+        self.total += seconds
+
+        for index, bound in enumerate(self.bounds):
+            if seconds <= bound:
+                self.counts[index] += 1
+                return
+
+        self.counts[-1] += 1
+
+    def to_model(self) -> Histogram:
+        """Convert the histogram to its response model."""
+        bounds: list[Optional[float]] = [*self.bounds, None]
+
+        return Histogram(
+            buckets=[HistogramBucket(le=bound, count=count) for bound, count in zip(bounds, self.counts)],
+            count=sum(self.counts),
+            sum=self.total,
+            timeouts=self.timeouts,
+        )
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """The default pool of asyncio engines, recording how long requests wait for a connection."""
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.wait_times = WaitTimes()
+
+    def connect(self):  # noqa: ANN201
+        """Check out a connection, recording how long it took to get it."""
+        start = time.perf_counter()
+
+        try:
+            return super().connect()
+        except TimeoutError:
+            self.wait_times.timeouts += 1
+            raise
+        finally:
+            self.wait_times.observe(time.perf_counter() - start)
+
+    def recreate(self) -> "InstrumentedPool":
+        """Create a new pool with the same configuration, which keeps the recorded wait times."""
+        pool = super().recreate()
+        pool.wait_times = self.wait_times
+        return pool
+
+    def statistics(self, name: str) -> PoolStatistics:
+        """Get the current usage of the pool and the recorded wait times."""
+        return PoolStatistics(
+            name=name,
+            size=self.size(),
+            checked_in=self.checkedin(),
+            checked_out=self.checkedout(),
+            overflow=max(self.overflow(), 0),
+            max_overflow=self._max_overflow,
+            wait_time=self.wait_times.to_model(),
+        )
@@ -0,0 +1,231 @@
+"""
+An in-process cache of the responses of GET routes, and their conditional requests.
+
+Routers opt in by using a `cached_route` as their route class, naming the resources of
+`api.changes` their responses are built from. Before running the endpoint, the versions of those
+resources are looked up, usually in memory, and the strong ETag of the response is derived from them:
+
+- Responses are cached by path, query parameters and ETag, for at most
+  `Config.RESPONSE_CACHE_TTL` seconds, and dropped as soon as one of their resources is published
+  as changed. As the ETag is part of the key, changes made by other processes are seen as soon as
+  they are committed, the notifications only free the memory sooner. So are the caches of the
+  ongoing jam used by the endpoints, which are dropped when they were built from older versions.
+- Requests whose `If-None-Match` header has the ETag of their response get a 304 response instead,
+  right away when the response is cached. Otherwise the endpoint runs first, so that the requests
+  that wouldn't get a 200, such as those for a resource that doesn't exist, get their usual response.
+
+Cached responses are sent compressed with the encoding negotiated with the client, and keep their
+compressed variants so that they are only compressed once, see `api.compression`. Each variant has
+its own ETag, derived from the ETag of the response and its encoding.
+
+Streamed responses, requests asking to read from the primary, and the operations of a batch,
+which may read what they wrote before it's committed, bypass the cache.
+"""
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Coroutine, NamedTuple, Optional
+
+import orjson
+from fastapi import Depends, Request, Response
+from fastapi.responses import StreamingResponse
+from fastapi.routing import APIRoute
+from starlette.datastructures import Headers, MutableHeaders
+
+from api import changes
+from api.compression import ENCODINGS, add_vary, compressed_variant, encoded_etag, is_compressible, negotiate
+from api.constants import Config
+from api.database import DBReadSession
+from api.dependencies import BATCH_SESSION_KEY, reads_from_primary
+from api.ongoing import refresh_ongoing
+from api.streaming import accepts_ndjson
+
+Handler = Callable[[Request], Coroutine[None, None, Response]]
+
+
+class CachedResponse(NamedTuple):
+    """A cached response, along with the resources it was built from and when it expires."""
+
+    resources: frozenset[str]
+    expires_at: float
+    status_code: int
+    body: bytes
+    # The headers of the response, without its content length which depends on the encoding of its body.
+    headers: dict[str, str]
+    # The body compressed with each of the encodings it was requested with.
+    variants: dict[str, bytes]
+
+
+class Respond(Exception):
+    """Raised by the dependencies of a cached route to respond without running its endpoint."""
+
+    def __init__(self, response: Response) -> None:
+        super().__init__()
+        self.response = response
+
+
+class ResponseCache:
+    """A bounded LRU cache of responses, expiring them after a TTL and whenever their resources change."""
+
+    def __init__(self, max_size: int, ttl: float) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self._responses: OrderedDict[tuple, CachedResponse] = OrderedDict()
+        # Bumped whenever a resource changes, so that a response built while it was changing isn't cached.
+        self._generations: dict[str, int] = {}
+
+    def invalidate(self, resources: frozenset[str]) -> None:
+        """Drop the responses built from any of the given resources."""
+        for resource in resources:
+            self._generations[resource] = self._generations.get(resource, 0) + 1
+
+        for key, response in list(self._responses.items()):
+            if response.resources & resources:
+                del self._responses[key]
+
+    def clear(self) -> None:
+        """Drop every cached response."""
+        self._responses.clear()
+
+    def generations(self, resources: frozenset[str]) -> list[int]:
+        """Get the number of times each of the given resources changed, to be given back to `put`."""
+        return [self._generations.get(resource, 0) for resource in sorted(resources)]
+
+    def get(self, key: tuple, encoding: Optional[str] = None) -> Optional[Response]:
+        """Get a copy of the cached response for `key`, if it is still fresh, compressed with `encoding` if given."""
+        if not (cached := self._responses.get(key)):
+            return None
+
+        if cached.expires_at <= time.monotonic():
+            del self._responses[key]
+            return None
+
+        self._responses.move_to_end(key)
+
+        body, headers = cached.body, MutableHeaders(cached.headers)
+        if encoding and (variant := compressed_variant(body, Headers(cached.headers), encoding, cached.variants)):
+            body = variant
+            headers["Content-Encoding"] = encoding
+            if "etag" in headers:
+                headers["ETag"] = encoded_etag(headers["etag"], encoding)
+        if is_compressible(Headers(cached.headers)):
+            add_vary(headers)
+
+        return Response(body, status_code=cached.status_code, headers=headers)
+
+    def put(self, key: tuple, resources: frozenset[str], generations: list[int], response: Response) -> bool:
+        """Cache `response`, unless one of its resources changed since `generations` were taken, and tell if it was."""
+        if generations != self.generations(resources):
+            return False
+
+        headers = {name: value for name, value in response.headers.items() if name != "content-length"}
+        # Precompressed responses come with some of their variants.
+        variants = dict(getattr(response, "variants", {}))
+
+        self._responses[key] = CachedResponse(
+            resources, time.monotonic() + self.ttl, response.status_code, response.body, headers, variants
+        )
+        if len(self._responses) > self.max_size:
+            self._responses.popitem(last=False)
+
+        return True
+
+
+response_cache = ResponseCache(Config.RESPONSE_CACHE_SIZE, Config.RESPONSE_CACHE_TTL)
+changes.subscribe(response_cache.invalidate)
+
+
+def bypasses_cache(request: Request) -> bool:
+    """Whether the request must be answered by the endpoint, without conditions."""
+    return (
+        BATCH_SESSION_KEY in request.scope
+        or reads_from_primary(request)
+        or accepts_ndjson(request.headers.get("Accept", ""))
+    )
+
+
+def make_etag(versions: dict[str, int]) -> str:
+    """Get the strong ETag of the responses built from resources with the given versions."""
+    return f'"{hashlib.sha1(orjson.dumps(versions, option=orjson.OPT_SORT_KEYS)).hexdigest()}"'
+
+
+def matching_etag(request: Request, etag: str) -> Optional[str]:
+    """
+    Get the ETag of the `If-None-Match` header of the request matching `etag`, with a weak comparison.
+
+    The ETags of the compressed variants of the response, see `encoded_etag`, match as well. Unlike other
+    ETags, `*` doesn't, as it would also match the resources that don't exist.
+    """
+    if not (header := request.headers.get("If-None-Match")):
+        return None
+
+    tags = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return next((tag for tag in (etag, *(encoded_etag(etag, encoding) for encoding in ENCODINGS)) if tag in tags), None)
+
+
+def not_modified(request: Request, response: Response) -> Response:
+    """Get a 304 response instead of `response`, a 200 with an ETag, if the request already has it."""
+    if matched := matching_etag(request, response.headers["ETag"]):
+        return Response(status_code=304, headers={"ETag": matched})
+
+    return response
+
+
+def cached_route(*resources: str) -> type[APIRoute]:
+    """Get a route class caching the responses of GET routes, which are built from the given resources."""
+    route_resources = frozenset(resources)
+
+    async def check_cache(request: Request, session: DBReadSession) -> None:
+        """Respond with the cached response, or a 304 if the request has its ETag, when it is already known."""
+        versions = await changes.versions(session, route_resources)
+        # The caches of the ongoing jam used by the endpoint may be missing changes that weren't notified yet.
+        refresh_ongoing(versions)
+
+        if bypasses_cache(request):
+            return
+
+        etag = make_etag(versions)
+        request.state.etag = etag
+        request.state.cache_key = (request.url.path, tuple(sorted(request.query_params.multi_items())), etag)
+        request.state.generations = response_cache.generations(route_resources)
+
+        if response := response_cache.get(
+            request.state.cache_key, negotiate(request.headers.get("Accept-Encoding", ""))
+        ):
+            raise Respond(not_modified(request, response))
+
+    class CachedRoute(APIRoute):
+        def __init__(self, path: str, endpoint: Callable[..., Any], **kwargs: Any) -> None:
+            if "GET" in (kwargs.get("methods") or ()):
+                kwargs["dependencies"] = [*(kwargs.get("dependencies") or ()), Depends(check_cache)]
+
+            super().__init__(path, endpoint, **kwargs)
+
+        def get_route_handler(self) -> Handler:
+            handler = super().get_route_handler()
+
+            if "GET" not in self.methods:
+                return handler
+
+            async def cached_handler(request: Request) -> Response:
+                try:
+                    response = await handler(request)
+                except Respond as respond:
+                    return respond.response
+
+                etag = getattr(request.state, "etag", None)
+                if etag and response.status_code == 200 and not isinstance(response, StreamingResponse):
+                    response.headers["ETag"] = etag
+                    key = request.state.cache_key
+
+                    if response_cache.put(key, route_resources, request.state.generations, response):
+                        encoding = negotiate(request.headers.get("Accept-Encoding", ""))
+                        response = response_cache.get(key, encoding) or response
+
+                    return not_modified(request, response)
+
+                return response
+
+            return cached_handler
+
+    return CachedRoute
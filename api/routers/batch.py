@@ -0,0 +1,155 @@
+import asyncio
+from typing import Any
+
+import orjson
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.exception_handlers import http_exception_handler, request_validation_exception_handler
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import StreamingResponse
+from pydantic import conlist
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.routing import BaseRoute, Match
+from starlette.types import Message
+
+from api.database import DBSession
+from api.dependencies import BATCH_SESSION_KEY
+from api.models import BatchOperation, BatchResponse, BatchResult
+from api.streaming import accepts_ndjson
+
+router = APIRouter(prefix="/batch", tags=["batch"])
+
+# The maximum number of operations of a batch.
+MAX_OPERATIONS = 100
+
+
+def operation_scope(request: Request, operation: BatchOperation, session: AsyncSession) -> dict[str, Any]:
+    """Build the scope of the request of an operation, which reuses the session and the authentication of the batch."""
+    path, _, query = operation.path.partition("?")
+    headers = [
+        (name, value) for name, value in request.scope["headers"] if name not in (b"content-length", b"content-type")
+    ]
+    if operation.body is not None:
+        headers.append((b"content-type", b"application/json"))
+
+    return {
+        **request.scope,
+        "method": operation.method.upper(),
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query.encode(),
+        "headers": headers,
+        "state": {},
+        BATCH_SESSION_KEY: session,
+    }
+
+
+def find_route(request: Request, scope: dict[str, Any]) -> BaseRoute:
+    """Find the route of the app handling `scope`, and add the parameters of its path to the scope."""
+    allowed_elsewhere = False
+
+    for route in request.app.router.routes:
+        match, child_scope = route.matches(scope)
+        if match == Match.FULL:
+            scope.update(child_scope)
+            return route
+
+        allowed_elsewhere |= match == Match.PARTIAL
+
+    if allowed_elsewhere:
+        raise HTTPException(status_code=405, detail="Method Not Allowed")
+    raise HTTPException(status_code=404, detail="Not Found")
+
+
+def is_streamed(route: BaseRoute) -> bool:
+    """Whether the responses of the route are always streamed."""
+    response_class = getattr(route, "response_class", None)
+    return isinstance(response_class, type) and issubclass(response_class, StreamingResponse)
+
+
+def parse_body(headers: dict[str, str], body: bytes) -> Any:
+    """Parse the body of the response to an operation, as JSON if it is JSON."""
+    if not body:
+        return None
+
+    if headers.get("content-type", "").startswith("application/json"):
+        return orjson.loads(body)
+
+    return body.decode()
+
+
+async def run_operation(request: Request, operation: BatchOperation, session: AsyncSession) -> BatchResult:
+    """Run an operation through the route handling its path, as if it were requested on its own."""
+    scope = operation_scope(request, operation, session)
+    body = b"" if operation.body is None else orjson.dumps(operation.body)
+    body_sent = False
+    status_code, headers, chunks = 500, {}, []
+
+    async def receive() -> Message:
+        nonlocal body_sent
+        if body_sent:
+            # The request is never disconnected, responses stop waiting for it once they are sent.
+            await asyncio.Event().wait()
+
+        body_sent = True
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message: Message) -> None:
+        nonlocal status_code, headers
+        if message["type"] == "http.response.start":
+            status_code = message["status"]
+            headers = {name.decode().lower(): value.decode() for name, value in message.get("headers", [])}
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    operation_request = Request(scope, receive)
+    try:
+        if scope["path"] == request.scope["path"]:
+            raise HTTPException(status_code=400, detail="Batches can't be nested.")
+
+        route = find_route(request, scope)
+        # Streams could last for as long as the client is connected, holding the transaction of the batch.
+        if is_streamed(route) or accepts_ndjson(operation_request.headers.get("Accept", "")):
+            raise HTTPException(status_code=400, detail="Streamed responses can't be requested in a batch.")
+
+        await route.handle(scope, receive, send)
+    except HTTPException as error:
+        response = await http_exception_handler(operation_request, error)
+        return BatchResult(status_code=response.status_code, body=parse_body(response.headers, response.body))
+    except RequestValidationError as error:
+        response = await request_validation_exception_handler(operation_request, error)
+        return BatchResult(status_code=response.status_code, body=parse_body(response.headers, response.body))
+
+    return BatchResult(status_code=status_code, body=parse_body(headers, b"".join(chunks)))
+
+
+@router.post("/", response_model=BatchResponse)
+async def run_batch(
+    request: Request, operations: conlist(BatchOperation, min_items=1, max_items=MAX_OPERATIONS), session: DBSession
+) -> BatchResponse:
+    """
+    Run the given operations in order, in a single transaction, and get the response to each of them.
+
+    Each operation is a request to another route of the API, with its method, path and query string,
+    and JSON body if any. They are handled as if they were requested on their own, except that they
+    see the changes of the previous operations. If an operation fails, with a 4xx or 5xx status code,
+    the following operations aren't run and the changes of the batch are rolled back.
+    """
+    results: list[BatchResult] = []
+    savepoint = await session.begin_nested()
+
+    try:
+        for operation in operations:
+            results.append(result := await run_operation(request, operation, session))
+            if result.status_code >= 400:
+                break
+    except BaseException:
+        await savepoint.rollback()
+        raise
+
+    committed = all(result.status_code < 400 for result in results)
+    if committed:
+        await savepoint.commit()
+    else:
+        await savepoint.rollback()
+
+    return BatchResponse(committed=committed, results=results)
@@ -1,66 +1,172 @@
+import gzip
 from typing import Optional
 
-from fastapi import APIRouter, HTTPException
-from sqlalchemy import desc, update
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from sqlalchemy import desc, distinct, func, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
-from api.database import DBSession, Jam, Team, TeamUser, User
-from api.models import CodeJam, CodeJamResponse
+from api import changes, models, team_import
+from api.archive import archive_jam, archived_document, refresh_archive
+from api.compression import GZIP, PrecompressedResponse
+from api.constants import Config
+from api.database import DBReadSession, DBSession, Infraction, Jam, Team, TeamUser, User
+from api.documents import codejam_document, render
+from api.models import CodeJam, CodeJamPage, CodeJamResponse, CodeJamSnapshot, TeamImportError, TeamImportResponse
+from api.ongoing import ongoing_jam, ongoing_snapshot
+from api.pagination import decode_cursor, encode_cursor
+from api.response_cache import cached_route
+
+router = APIRouter(
+    prefix="/codejams",
+    tags=["codejams"],
+    route_class=cached_route(changes.CODEJAMS, changes.INFRACTIONS, changes.TEAMS, changes.WINNERS),
+)
+
+# The number of teams of an upload inserted with each statement.
+IMPORT_BATCH_SIZE = 100
+
 
-router = APIRouter(prefix="/codejams", tags=["codejams"])
+@router.get("/", response_model=CodeJamPage, responses={400: {"description": "The pagination cursor is invalid."}})
+async def get_codejams(
+    session: DBReadSession,
+    limit: int = Query(default=50, ge=1, le=100),
+    after: Optional[str] = None,
+) -> Response:
+    """
+    Get a page of codejam summaries, newest first.
+
+    Pass the `next_cursor` of a page as `after` to get the following page.
+    Use the single codejam endpoint to get the teams, infractions and winners of a codejam.
+    """
+    team_count = select(func.count(Team.id)).where(Team.jam_id == Jam.id).scalar_subquery()
+    user_count = (
+        select(func.count(distinct(TeamUser.user_id)))
+        .join_from(TeamUser, Team)
+        .where(Team.jam_id == Jam.id)
+        .scalar_subquery()
+    )
+    infraction_count = select(func.count(Infraction.id)).where(Infraction.jam_id == Jam.id).scalar_subquery()
+
+    query = select(
+        Jam.id,
+        Jam.name,
+        Jam.ongoing,
+        team_count.label("team_count"),
+        user_count.label("user_count"),
+        infraction_count.label("infraction_count"),
+    )
+    if after is not None:
+        query = query.where(Jam.id < decode_cursor(after))
+
+    # Fetch one extra row to find out whether there is a next page.
+    codejams = (await session.execute(query.order_by(desc(Jam.id)).limit(limit + 1))).all()
+
+    next_cursor = None
+    if len(codejams) > limit:
+        codejams = codejams[:limit]
+        next_cursor = encode_cursor(codejams[-1].id)
+
+    page = {"codejams": [codejam._asdict() for codejam in codejams], "next_cursor": next_cursor}
+    return render(page, CodeJamPage)
 
 
-@router.get("/")
-async def get_codejams(session: DBSession) -> list[CodeJamResponse]:
-    """Get all the codejams stored in the database."""
-    codejams = await session.execute(select(Jam).order_by(desc(Jam.id)))
-    codejams.unique()
+@router.get(
+    "/current/snapshot",
+    response_model=CodeJamSnapshot,
+    responses={404: {"description": "There is no ongoing code jam."}},
+)
+async def get_ongoing_codejam_snapshot(session: DBReadSession) -> Response:
+    """
+    Get the ongoing codejam along with all of its teams, and the ID of the team of each participant.
+
+    This is everything needed to follow the ongoing codejam in one request. The snapshot is kept
+    serialized in memory, and only rebuilt when the codejams or teams change.
+    """
+    if not (ongoing := await ongoing_jam.get(session)):
+        raise HTTPException(status_code=404, detail="There is no ongoing codejam.")
 
-    return codejams.scalars().all()
+    return Response(await ongoing_snapshot.get(session, ongoing), media_type="application/json")
 
 
 @router.get(
     "/{codejam_id}",
+    response_model=CodeJamResponse,
     responses={404: {"description": "CodeJam could not be found or there is no ongoing code jam."}},
 )
-async def get_codejam(codejam_id: int, session: DBSession) -> CodeJamResponse:
+async def get_codejam(codejam_id: int, session: DBReadSession) -> Response:
     """
     Get a specific codejam stored in the database by ID.
 
     Passing -1 as the codejam ID will return the ongoing codejam.
     """
     if codejam_id == -1:
-        ongoing_jams = (await session.execute(select(Jam).where(Jam.ongoing == True))).unique().scalars().all()
-
-        if not ongoing_jams:
+        if not (ongoing := await ongoing_jam.get(session)):
             raise HTTPException(status_code=404, detail="There is no ongoing codejam.")
 
-        # With the current implementation, there should only be one ongoing codejam.
-        return ongoing_jams[0]
+        codejam_id = ongoing.id
 
-    jam_result = await session.execute(select(Jam).where(Jam.id == codejam_id))
-    jam_result.unique()
+    if (archived := await archived_document(session, codejam_id)) is not None:
+        # Clients accepting gzip get the archived document as it is stored.
+        return PrecompressedResponse(
+            gzip.decompress(archived),
+            {GZIP: archived},
+            media_type="application/json",
+            headers={"Cache-Control": f"private, max-age={Config.ARCHIVE_MAX_AGE}"},
+        )
 
-    if not (jam := jam_result.scalars().one_or_none()):
+    if not (jam := await codejam_document(session, codejam_id)):
         raise HTTPException(status_code=404, detail="CodeJam with specified ID could not be found.")
 
-    return jam
+    return render(jam, CodeJamResponse)
+
+
+@router.post(
+    "/{codejam_id}/archive",
+    response_model=CodeJamResponse,
+    responses={
+        404: {"description": "CodeJam with specified ID could not be found."},
+        409: {"description": "The codejam is ongoing."},
+    },
+)
+async def archive_codejam(codejam_id: int, session: DBSession) -> Response:
+    """
+    Freeze the document of a finished codejam, so that it's served as it is from then on.
+
+    Archived codejams can still be modified, their document is rebuilt by every change made to them.
+    """
+    ongoing = (await session.execute(select(Jam.ongoing).where(Jam.id == codejam_id))).scalars().one_or_none()
+
+    if ongoing is None:
+        raise HTTPException(status_code=404, detail="CodeJam with specified ID could not be found.")
 
+    if ongoing:
+        raise HTTPException(status_code=409, detail="The ongoing codejam can't be archived.")
 
-@router.patch("/{codejam_id}", responses={404: {"description": "Code Jam with specified ID does not exist."}})
+    return render(await archive_jam(session, codejam_id), CodeJamResponse)
+
+
+@router.patch(
+    "/{codejam_id}",
+    response_model=CodeJamResponse,
+    responses={404: {"description": "Code Jam with specified ID does not exist."}},
+)
 async def modify_codejam(
     codejam_id: int,
     session: DBSession,
     name: Optional[str] = None,
     ongoing: Optional[bool] = None,
-) -> CodeJamResponse:
+) -> Response:
     """Modify the specified codejam to change its name and/or whether it's the ongoing code jam."""
     codejam = await session.execute(select(Jam).where(Jam.id == codejam_id))
-    codejam.unique()
 
     if not codejam.scalars().one_or_none():
         raise HTTPException(status_code=404, detail="Code Jam with specified ID does not exist.")
 
+    if name is not None or ongoing is not None:
+        await changes.publish(session, changes.CODEJAMS, jam_id=codejam_id)
+
     if name is not None:
         await session.execute(update(Jam).where(Jam.id == codejam_id).values(name=name))
 
@@ -69,16 +175,63 @@ async def modify_codejam(
         await session.execute(update(Jam).where(Jam.ongoing == True).values(ongoing=False))
         await session.execute(update(Jam).where(Jam.id == codejam_id).values(ongoing=True))
 
-    jam_result = await session.execute(select(Jam).where(Jam.id == codejam_id))
-    jam_result.unique()
+    await refresh_archive(session, codejam_id)
+    return render(await codejam_document(session, codejam_id), CodeJamResponse)
 
-    jam = jam_result.scalars().one()
 
-    return jam
+async def insert_teams(
+    session: AsyncSession, jam_id: int, teams: list[models.Team], skip_existing: bool = False
+) -> list[Optional[int]]:
+    """
+    Insert the given teams and their members into the specified jam and return the IDs of the teams.
 
+    Everything is inserted with one statement per table, no matter how many teams and members there are.
+    Members that aren't in the users table yet are added to it.
 
-@router.post("/")
-async def create_codejam(codejam: CodeJam, session: DBSession) -> CodeJamResponse:
+    If `skip_existing` is set, teams with the same name as a team of the jam are not inserted,
+    and their ID is returned as None.
+    """
+    if not teams:
+        return []
+
+    statement = (
+        insert(Team)
+        .values(
+            [
+                {
+                    "jam_id": jam_id,
+                    "name": team.name,
+                    "discord_role_id": team.discord_role_id,
+                    "discord_channel_id": team.discord_channel_id,
+                }
+                for team in teams
+            ]
+        )
+        .returning(Team.name, Team.id)
+    )
+    if skip_existing:
+        statement = statement.on_conflict_do_nothing()
+
+    inserted_teams = await session.execute(statement)
+    # Team names are unique within a jam, so they identify the returned rows.
+    team_ids = dict(inserted_teams.all())
+
+    members = [
+        {"team_id": team_ids[team.name], "user_id": user.user_id, "is_leader": user.is_leader}
+        for team in teams
+        if team.name in team_ids
+        for user in team.users
+    ]
+    if members:
+        user_ids = {member["user_id"] for member in members}
+        await session.execute(insert(User).values([{"id": user_id} for user_id in user_ids]).on_conflict_do_nothing())
+        await session.execute(insert(TeamUser).values(members))
+
+    return [team_ids.get(team.name) for team in teams]
+
+
+@router.post("/", response_model=CodeJamResponse)
+async def create_codejam(codejam: CodeJam, session: DBSession) -> Response:
     """
     Create a new codejam and get back the one just created.
 
@@ -92,37 +245,71 @@ async def create_codejam(codejam: CodeJam, session: DBSession) -> CodeJamRespons
     # Flush here to receive jam ID
     await session.flush()
 
-    for raw_team in codejam.teams:
-        team = Team(
-            jam_id=jam.id,
-            name=raw_team.name,
-            discord_role_id=raw_team.discord_role_id,
-            discord_channel_id=raw_team.discord_channel_id,
-        )
-        session.add(team)
-        # Flush here to receive team ID
-        await session.flush()
-
-        for raw_user in raw_team.users:
-            if (
-                not (await session.execute(select(User).where(User.id == raw_user.user_id)))
-                .unique()
-                .scalars()
-                .one_or_none()
-            ):
-                user = User(id=raw_user.user_id)
-                session.add(user)
-
-            team_user = TeamUser(team_id=team.id, user_id=raw_user.user_id, is_leader=raw_user.is_leader)
-            session.add(team_user)
+    await changes.publish(session, changes.CODEJAMS, changes.TEAMS, changes.USERS, jam_id=jam.id)
+    await insert_teams(session, jam.id, codejam.teams)
+
+    return render(await codejam_document(session, jam.id), CodeJamResponse)
+
+
+@router.post(
+    "/{codejam_id}/teams",
+    responses={
+        404: {"description": "CodeJam with specified ID could not be found."},
+        415: {"description": "The upload is neither NDJSON nor CSV."},
+    },
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                team_import.NDJSON: {"schema": {"$ref": "#/components/schemas/Team"}},
+                team_import.CSV: {"schema": {"type": "string"}},
+            },
+        }
+    },
+)
+async def import_teams(codejam_id: int, request: Request, session: DBSession) -> TeamImportResponse:
+    """
+    Add the teams of an NDJSON or CSV upload to the specified codejam.
 
-    await session.flush()
+    The upload is read as it is received and its teams are inserted in batches, in a single transaction.
+    Teams that can't be imported, for example because their name is already taken, are reported
+    along with the line on which they start, and don't prevent the other teams from being imported.
+    See `api.team_import` for the supported formats.
+    """
+    if not (await session.execute(select(Jam.id).where(Jam.id == codejam_id))).scalars().one_or_none():
+        raise HTTPException(status_code=404, detail="CodeJam with specified ID could not be found.")
+
+    content_type = request.headers.get("Content-Type", "").split(";")[0].strip().lower()
+    if content_type not in team_import.CONTENT_TYPES:
+        raise HTTPException(status_code=415, detail=f"Expected one of {', '.join(team_import.CONTENT_TYPES)}.")
+
+    created = []
+    errors = []
+    batch = []
+
+    async def import_batch() -> None:
+        team_ids = await insert_teams(session, codejam_id, [parsed.team for parsed in batch], skip_existing=True)
+
+        for parsed, team_id in zip(batch, team_ids):
+            if team_id is None:
+                errors.append(TeamImportError(line=parsed.line, detail="A team with this name already exists."))
+            else:
+                created.append(team_id)
+
+        batch.clear()
+
+    async for parsed in team_import.parse_teams(content_type, request.stream()):
+        if parsed.error is not None:
+            errors.append(TeamImportError(line=parsed.line, detail=parsed.error))
+            continue
 
-    # Pydantic, what is synchronous, may attempt to call async methods if current jam
-    # object is returned. To avoid this, fetch all data here, in async context.
-    jam_result = await session.execute(select(Jam).where(Jam.id == jam.id))
-    jam_result.unique()
+        batch.append(parsed)
+        if len(batch) == IMPORT_BATCH_SIZE:
+            await import_batch()
 
-    jam = jam_result.scalars().one()
+    await import_batch()
 
-    return jam
+    await changes.publish(session, changes.TEAMS, changes.USERS, jam_id=codejam_id)
+    await refresh_archive(session, codejam_id)
+    errors.sort(key=lambda error: error.line)
+    return TeamImportResponse(created=created, errors=errors)
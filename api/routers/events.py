@@ -0,0 +1,35 @@
+from typing import Optional
+
+from fastapi import APIRouter, Header
+from fastapi.responses import StreamingResponse
+
+from api.database import DBReadSession
+from api.events import EVENT_STREAM, broadcaster
+from api.pagination import decode_composite_cursor
+
+router = APIRouter(prefix="/events", tags=["events"])
+
+
+@router.get(
+    "/",
+    response_class=StreamingResponse,
+    responses={
+        200: {"content": {EVENT_STREAM: {}}, "description": "A stream of `change` events."},
+        400: {"description": "The last event ID is invalid."},
+    },
+)
+async def get_events(session: DBReadSession, last_event_id: Optional[str] = Header(default=None)) -> StreamingResponse:
+    """
+    Stream the changes made to the resources of the API as Server-Sent Events, as they are committed.
+
+    The data of each `change` event is a change as listed by the change feed, and its ID is the cursor
+    of the feed following it. Clients that reconnect with the `Last-Event-ID` header first get the changes
+    they missed. Clients that don't read their events fast enough are disconnected.
+    """
+    last_key = decode_composite_cursor(last_event_id, 2) if last_event_id is not None else None
+
+    return StreamingResponse(
+        broadcaster.stream(session, last_key),
+        media_type=EVENT_STREAM,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
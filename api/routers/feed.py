@@ -0,0 +1,39 @@
+from typing import Optional
+
+from fastapi import APIRouter, Query, Response
+
+from api.database import DBReadSession
+from api.documents import change_documents, render
+from api.models import ChangePage
+from api.pagination import decode_composite_cursor, encode_cursor
+
+router = APIRouter(prefix="/changes", tags=["changes"])
+
+
+@router.get("/", response_model=ChangePage, responses={400: {"description": "The cursor is invalid."}})
+async def get_changes(
+    session: DBReadSession,
+    since: Optional[str] = None,
+    limit: int = Query(default=100, ge=1, le=1000),
+) -> Response:
+    """
+    Get the changes made after the `since` cursor, or since the beginning, in the order they were committed.
+
+    Pass the returned `cursor` as `since` to get the changes that follow, once they are made or
+    right away when `has_more` is set. Each change names the resources it modified, and the jam,
+    team or user it modified when there is one, so that clients only fetch those again.
+    """
+    after = decode_composite_cursor(since, 2) if since is not None else None
+    # Fetch one extra change to find out whether there are more changes.
+    changes = await change_documents(session, after, limit + 1)
+
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+
+    if changes:
+        cursor = encode_cursor(*changes[-1][0])
+    else:
+        cursor = since or encode_cursor(0, 0)
+
+    page = {"changes": [change for _key, change in changes], "cursor": cursor, "has_more": has_more}
+    return render(page, ChangePage)
@@ -1,46 +1,50 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Response
 from sqlalchemy.future import select
 
-from api.database import DBSession
+from api import changes
+from api.archive import refresh_archive
+from api.database import DBReadSession, DBSession
 from api.database import Infraction as DbInfraction
 from api.database import Jam, User
+from api.documents import infraction_document, infraction_documents, render, stream_infraction_documents
 from api.models import Infraction, InfractionResponse
+from api.response_cache import cached_route
+from api.streaming import NDJSON_RESPONSES, AcceptsNDJSON, ndjson_response
 
-router = APIRouter(prefix="/infractions", tags=["infractions"])
+router = APIRouter(prefix="/infractions", tags=["infractions"], route_class=cached_route(changes.INFRACTIONS))
 
 
-@router.get("/")
-async def get_infractions(session: DBSession) -> list[InfractionResponse]:
+@router.get("/", response_model=list[InfractionResponse], responses=NDJSON_RESPONSES)
+async def get_infractions(session: DBReadSession, ndjson: AcceptsNDJSON) -> Response:
     """Get every infraction stored in the database."""
-    infractions = await session.execute(select(DbInfraction))
-    infractions.unique()
+    if ndjson:
+        return ndjson_response(stream_infraction_documents(session))
 
-    return infractions.scalars().all()
+    return render(await infraction_documents(session), list[InfractionResponse])
 
 
 @router.get(
     "/{infraction_id}",
+    response_model=InfractionResponse,
     responses={404: {"description": "Infraction could not be found."}},
 )
-async def get_infraction(infraction_id: int, session: DBSession) -> InfractionResponse:
+async def get_infraction(infraction_id: int, session: DBReadSession) -> Response:
     """Get a specific infraction stored in the database by ID."""
-    infraction_result = await session.execute(select(DbInfraction).where(DbInfraction.id == infraction_id))
-    infraction_result.unique()
-
-    if not (infraction := infraction_result.scalars().one_or_none()):
+    if not (infractions := await infraction_documents(session, DbInfraction.id == infraction_id)):
         raise HTTPException(404, "Infraction with specified ID could not be found.")
 
-    return infraction
+    return render(infractions[0], InfractionResponse)
 
 
 @router.post(
     "/",
+    response_model=InfractionResponse,
     responses={404: {"Description": "Jam ID or User ID could not be found."}},
 )
 async def create_infraction(
     infraction: Infraction,
     session: DBSession,
-) -> InfractionResponse:
+) -> Response:
     """Add an infraction for a user to the database."""
     jam_id = (await session.execute(select(Jam.id).where(Jam.id == infraction.jam_id))).scalars().one_or_none()
 
@@ -52,13 +56,12 @@ async def create_infraction(
     if user_id is None:
         raise HTTPException(404, "User with specified ID could not be found.")
 
+    await changes.publish(session, changes.INFRACTIONS, jam_id=jam_id, user_id=user_id)
     infraction = DbInfraction(
         user_id=user_id, jam_id=jam_id, infraction_type=infraction.infraction_type, reason=infraction.reason
     )
     session.add(infraction)
     await session.flush()
+    await refresh_archive(session, jam_id)
 
-    infraction_result = await session.execute(select(DbInfraction).where(DbInfraction.id == infraction.id))
-    infraction_result.unique()
-
-    return infraction_result.scalars().one()
+    return render(infraction_document(infraction), InfractionResponse)
@@ -0,0 +1,17 @@
+from fastapi import APIRouter
+
+from api.database import engine, replica_engine
+from api.models import PoolStatistics
+
+router = APIRouter(prefix="/internal", tags=["internal"])
+
+
+@router.get("/pool")
+async def get_pool_statistics() -> list[PoolStatistics]:
+    """Get the usage of the database connection pools and how long requests waited for a connection."""
+    statistics = [engine.pool.statistics("primary")]
+
+    if replica_engine is not engine:
+        statistics.append(replica_engine.pool.statistics("replica"))
+
+    return statistics
@@ -5,17 +5,22 @@ from sqlalchemy import func
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
-from api.database import DBSession, Jam, Team, TeamUser
+from api import changes
+from api.archive import refresh_archive
+from api.database import DBReadSession, DBSession, Team, TeamUser
 from api.database import User as DbUser
+from api.documents import render, stream_team_documents, team_documents, user_document
 from api.models import TeamResponse, User
+from api.ongoing import ongoing_jam
+from api.response_cache import cached_route
+from api.streaming import NDJSON, NDJSON_RESPONSES, AcceptsNDJSON, ndjson_response
 
-router = APIRouter(prefix="/teams", tags=["teams"])
+router = APIRouter(prefix="/teams", tags=["teams"], route_class=cached_route(changes.CODEJAMS, changes.TEAMS))
 
 
 async def ensure_team_exists(team_id: int, session: AsyncSession) -> Team:
     """Ensure that a team with the given ID exists and return it."""
     teams = await session.execute(select(Team).where(Team.id == team_id))
-    teams.unique()
 
     if not (team := teams.scalars().one_or_none()):
         raise HTTPException(status_code=404, detail="Team with specified ID could not be found.")
@@ -26,7 +31,6 @@ async def ensure_team_exists(team_id: int, session: AsyncSession) -> Team:
 async def ensure_user_exists(user_id: int, session: AsyncSession) -> DbUser:
     """Ensure that a user with the given ID exists and return it."""
     users = await session.execute(select(DbUser).where(DbUser.id == user_id))
-    users.unique()
 
     if not (user := users.scalars().one_or_none()):
         raise HTTPException(status_code=404, detail="User with specified ID could not be found.")
@@ -34,61 +38,68 @@ async def ensure_user_exists(user_id: int, session: AsyncSession) -> DbUser:
     return user
 
 
-@router.get("/")
-async def get_teams(session: DBSession, current_jam: bool = False) -> list[TeamResponse]:
+@router.get("/", response_model=list[TeamResponse], responses=NDJSON_RESPONSES)
+async def get_teams(session: DBReadSession, ndjson: AcceptsNDJSON, current_jam: bool = False) -> Response:
     """Get every code jam team in the database."""
-    if not current_jam:
-        teams = await session.execute(select(Team))
-    else:
-        teams = await session.execute(select(Team).join_from(Team, Jam).where(Jam.ongoing == True))
+    where = None
 
-    teams.unique()
-    return teams.scalars().all()
+    if current_jam:
+        if not (ongoing := await ongoing_jam.get(session)):
+            return Response(media_type=NDJSON) if ndjson else render([], list[TeamResponse])
 
+        where = Team.jam_id == ongoing.id
 
-@router.get("/find", responses={404: {"description": "Team could not be found."}})
+    if ndjson:
+        return ndjson_response(stream_team_documents(session, where))
+
+    return render(await team_documents(session, where), list[TeamResponse])
+
+
+@router.get("/find", response_model=TeamResponse, responses={404: {"description": "Team could not be found."}})
 async def find_team_by_name(
     name: str,
-    session: DBSession,
+    session: DBReadSession,
     jam_id: Optional[int] = None,
-) -> TeamResponse:
+) -> Response:
     """Get a specific code jam team by name."""
     if jam_id is None:
-        teams = await session.execute(
-            select(Team).join(Team.jam).where((func.lower(Team.name) == func.lower(name)) & (Jam.ongoing == True))
-        )
-    else:
-        teams = await session.execute(
-            select(Team).where((func.lower(Team.name) == func.lower(name)) & (Team.jam_id == jam_id))
-        )
+        if not (ongoing := await ongoing_jam.get(session)):
+            raise HTTPException(status_code=404, detail="Team with specified name could not be found.")
 
-    teams.unique()
+        jam_id = ongoing.id
 
-    if not (team := teams.scalars().one_or_none()):
+    teams = await team_documents(session, (func.lower(Team.name) == func.lower(name)) & (Team.jam_id == jam_id))
+
+    if not teams:
         raise HTTPException(status_code=404, detail="Team with specified name could not be found.")
 
-    return team
+    return render(teams[0], TeamResponse)
 
 
-@router.get("/{team_id}", responses={404: {"description": "Team could not be found."}})
-async def get_team(team_id: int, session: DBSession) -> TeamResponse:
+@router.get("/{team_id}", response_model=TeamResponse, responses={404: {"description": "Team could not be found."}})
+async def get_team(team_id: int, session: DBReadSession) -> Response:
     """Get a specific code jam team in the database by ID."""
-    return await ensure_team_exists(team_id, session)
+    if not (teams := await team_documents(session, Team.id == team_id)):
+        raise HTTPException(status_code=404, detail="Team with specified ID could not be found.")
 
+    return render(teams[0], TeamResponse)
 
-@router.get("/{team_id}/users", responses={404: {"description": "Team could not be found."}})
-async def get_team_users(team_id: int, session: DBSession) -> list[User]:
+
+@router.get("/{team_id}/users", response_model=list[User], responses={404: {"description": "Team could not be found."}})
+async def get_team_users(team_id: int, session: DBReadSession) -> Response:
     """Get the users of a specific code jam team in the database."""
     await ensure_team_exists(team_id, session)
 
-    team_users = await session.execute(select(TeamUser).where(TeamUser.team_id == team_id))
-    team_users.unique()
+    team_users = await session.execute(
+        select(TeamUser.user_id, TeamUser.is_leader).where(TeamUser.team_id == team_id).order_by(TeamUser.user_id)
+    )
 
-    return team_users.scalars().all()
+    return render([user_document(team_user) for team_user in team_users.all()], list[User])
 
 
 @router.post(
     "/{team_id}/users/{user_id}",
+    response_model=User,
     responses={
         404: {
             "description": "Team or user could not be found.",
@@ -96,24 +107,25 @@ async def get_team_users(team_id: int, session: DBSession) -> list[User]:
         400: {"description": "This user is already on the team."},
     },
 )
-async def add_user_to_team(team_id: int, user_id: int, session: DBSession, is_leader: bool = False) -> User:
+async def add_user_to_team(team_id: int, user_id: int, session: DBSession, is_leader: bool = False) -> Response:
     """Add a user to a specific code jam team in the database."""
-    await ensure_team_exists(team_id, session)
+    team = await ensure_team_exists(team_id, session)
     await ensure_user_exists(user_id, session)
 
     team_users = await session.execute(
         select(TeamUser).where((TeamUser.team_id == team_id) & (TeamUser.user_id == user_id))
     )
-    team_users.unique()
 
     if team_users.scalars().one_or_none():
         raise HTTPException(status_code=400, detail="This user is already on this team.")
 
+    await changes.publish(session, changes.TEAMS, team_id=team_id, user_id=user_id)
     team_user = TeamUser(team_id=team_id, user_id=user_id, is_leader=is_leader)
     session.add(team_user)
     await session.flush()
+    await refresh_archive(session, team.jam_id)
 
-    return team_user
+    return render(user_document(team_user), User)
 
 
 @router.delete(
@@ -132,17 +144,18 @@ async def remove_user_from_team(
     session: DBSession,
 ) -> Response:
     """Remove a user from a specific code jam team in the database."""
-    await ensure_team_exists(team_id, session)
+    team = await ensure_team_exists(team_id, session)
 
     team_users = await session.execute(
         select(TeamUser).where((TeamUser.team_id == team_id) & (TeamUser.user_id == user_id))
     )
-    team_users.unique()
 
     if not (team_user := team_users.scalars().one_or_none()):
         raise HTTPException(status_code=400, detail="This user is not on this team.")
 
+    await changes.publish(session, changes.TEAMS, team_id=team_id, user_id=user_id)
     await session.delete(team_user)
     await session.flush()
+    await refresh_archive(session, team.jam_id)
 
     return Response(status_code=204)
@@ -1,90 +1,173 @@
-from typing import Any
+from collections import defaultdict
+from typing import Any, AsyncIterator
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Response
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.future import select
-
-from api.database import DBSession, Jam, TeamUser, User
+from sqlalchemy.future import Select, select
+from sqlalchemy.orm import join
+from sqlalchemy.sql import FromClause
+
+from api import changes
+from api.database import DBReadSession, DBSession, Infraction, Team, TeamUser, User, Winner
+from api.documents import (
+    add_participation_row,
+    infraction_documents,
+    member_document,
+    participant_document,
+    participation_document,
+    render,
+    team_documents,
+)
 from api.models import UserResponse, UserTeamResponse
+from api.ongoing import ongoing_jam, ongoing_roster
+from api.response_cache import cached_route
+from api.streaming import NDJSON_RESPONSES, AcceptsNDJSON, ndjson_response
+
+router = APIRouter(
+    prefix="/users",
+    tags=["users"],
+    route_class=cached_route(changes.CODEJAMS, changes.INFRACTIONS, changes.TEAMS, changes.USERS, changes.WINNERS),
+)
 
-router = APIRouter(prefix="/users", tags=["users"])
+
+def participation_query(membership: FromClause) -> Select:
+    """
+    Select every membership of `membership`, joined with the winner entry and the infractions of the user in that jam.
+
+    A membership is repeated once per infraction, and appears once with empty infraction columns if there are none.
+    The user and jam of an infraction are those of its membership, so the rows are infraction rows as well.
+    """
+    return (
+        select(
+            TeamUser.user_id,
+            TeamUser.team_id,
+            TeamUser.is_leader,
+            Team.jam_id,
+            Winner.first_place,
+            Infraction.id,
+            Infraction.reason,
+            Infraction.infraction_type,
+        )
+        .select_from(membership)
+        .outerjoin(Winner, (Winner.jam_id == Team.jam_id) & (Winner.user_id == TeamUser.user_id))
+        .outerjoin(Infraction, (Infraction.jam_id == Team.jam_id) & (Infraction.user_id == TeamUser.user_id))
+    )
 
 
 async def get_user_data(session: AsyncSession, user_id: int) -> dict[str, Any]:
     """Get the participation history of the specified user."""
-    user: dict[str, Any] = {"id": user_id}
-    participation_history = []
-
-    user_teams = await session.execute(select(TeamUser).where(TeamUser.user_id == user_id))
-    user_teams.unique()
-
-    for user_team in user_teams.scalars().all():
-        top_10 = False
-        first_place = False
-
-        for winner in user_team.team.jam.winners:
-            if winner.user_id == user_id:
-                top_10 = True
-                first_place = winner.first_place
-                break
-
-        infractions = [infraction for infraction in user_team.team.jam.infractions if infraction.user_id == user_id]
-
-        participation_history.append(
-            {
-                "jam_id": user_team.team.jam.id,
-                "top_10": top_10,
-                "first_place": first_place,
-                "team_id": user_team.team.id,
-                "is_leader": user_team.is_leader,
-                "infractions": infractions,
-            }
+    rows = await session.execute(
+        participation_query(join(TeamUser, Team))
+        .where(TeamUser.user_id == user_id)
+        .order_by(Team.jam_id, TeamUser.team_id, Infraction.id)
+    )
+
+    participation_history: dict[int, dict[str, Any]] = {}
+    for row in rows.all():
+        add_participation_row(participation_history, row)
+
+    return participant_document(user_id, list(participation_history.values()))
+
+
+async def get_all_users_data(session: AsyncSession) -> list[dict[str, Any]]:
+    """Get the participation history of every user in the database."""
+    # Every membership of every user, joined with the winner entry of the user in that jam, if any.
+    # Users that never were on a team are returned as a single row without membership columns.
+    memberships = await session.execute(
+        select(
+            User.id.label("user_id"),
+            TeamUser.team_id,
+            TeamUser.is_leader,
+            Team.jam_id,
+            Winner.first_place,
         )
+        .outerjoin(TeamUser, TeamUser.user_id == User.id)
+        .outerjoin(Team, Team.id == TeamUser.team_id)
+        .outerjoin(Winner, (Winner.jam_id == Team.jam_id) & (Winner.user_id == User.id))
+        .order_by(User.id, Team.jam_id, TeamUser.team_id)
+    )
+
+    infractions = await infraction_documents(session, Infraction.user_id.is_not(None) & Infraction.jam_id.is_not(None))
+    infractions_by_participation = defaultdict(list)
+    for infraction in infractions:
+        infractions_by_participation[infraction["jam_id"], infraction["user_id"]].append(infraction)
+
+    users: dict[int, dict[str, Any]] = {}
+    for membership in memberships.all():
+        user = users.setdefault(membership.user_id, participant_document(membership.user_id, []))
+
+        if membership.team_id is None:
+            continue
+
+        infractions = infractions_by_participation[membership.jam_id, membership.user_id]
+        user["participation_history"].append(participation_document(membership, infractions))
+
+    return list(users.values())
 
-    user["participation_history"] = participation_history
 
-    return user
+async def stream_users_data(session: AsyncSession) -> AsyncIterator[dict[str, Any]]:
+    """Stream the participation history of every user in the database, ordered by ID."""
+    # Users that never were on a team are returned as a single row without membership columns.
+    memberships = join(User, join(TeamUser, Team), TeamUser.user_id == User.id, isouter=True)
+    rows = await session.stream(
+        participation_query(memberships)
+        .add_columns(User.id.label("participant_id"))
+        .order_by(User.id, Team.jam_id, TeamUser.team_id, Infraction.id)
+    )
 
+    user_id, participation_history = None, {}
+    async for row in rows:
+        if user_id is not None and row.participant_id != user_id:
+            yield participant_document(user_id, list(participation_history.values()))
+            participation_history = {}
 
-@router.get("/")
-async def get_users(session: DBSession) -> list[UserResponse]:
+        user_id = row.participant_id
+        if row.team_id is not None:
+            add_participation_row(participation_history, row)
+
+    if user_id is not None:
+        yield participant_document(user_id, list(participation_history.values()))
+
+
+@router.get("/", response_model=list[UserResponse], responses=NDJSON_RESPONSES)
+async def get_users(session: DBReadSession, ndjson: AcceptsNDJSON) -> Response:
     """Get information about all the users stored in the database."""
-    users = await session.execute(select(User.id))
-    users.unique()
+    if ndjson:
+        return ndjson_response(stream_users_data(session))
 
-    return [await get_user_data(session, user) for user in users.scalars().all()]
+    return render(await get_all_users_data(session), list[UserResponse])
 
 
-@router.get("/{user_id}", responses={404: {"description": "User could not be found."}})
-async def get_user(user_id: int, session: DBSession) -> UserResponse:
+@router.get("/{user_id}", response_model=UserResponse, responses={404: {"description": "User could not be found."}})
+async def get_user(user_id: int, session: DBReadSession) -> Response:
     """Get a specific user stored in the database by ID."""
     user = await session.execute(select(User).where(User.id == user_id))
-    user.unique()
 
     if not user.scalars().one_or_none():
         raise HTTPException(status_code=404, detail="User with specified ID could not be found.")
 
-    return await get_user_data(session, user_id)
+    return render(await get_user_data(session, user_id), UserResponse)
 
 
-@router.post("/{user_id}", responses={400: {"description": "User already exists."}})
-async def create_user(user_id: int, session: DBSession) -> UserResponse:
+@router.post("/{user_id}", response_model=UserResponse, responses={400: {"description": "User already exists."}})
+async def create_user(user_id: int, session: DBSession) -> Response:
     """Create a new user with the specified ID to the database."""
     user = await session.execute(select(User).where(User.id == user_id))
-    user.unique()
 
     if user.scalars().one_or_none():
         raise HTTPException(status_code=400, detail="User with specified ID already exists.")
 
+    await changes.publish(session, changes.USERS, user_id=user_id)
     user = User(id=user_id)
     session.add(user)
     await session.flush()
 
-    return await get_user_data(session, user_id)
+    return render(await get_user_data(session, user_id), UserResponse)
 
 
 @router.get(
     "/{user_id}/current_team",
+    response_model=UserTeamResponse,
     responses={
         404: {
             "description": (
@@ -93,28 +176,37 @@ async def create_user(user_id: int, session: DBSession) -> UserResponse:
         }
     },
 )
-async def get_current_team(user_id: int, session: DBSession) -> UserTeamResponse:
+async def get_current_team(user_id: int, session: DBReadSession) -> Response:
     """Get a user's current team information."""
-    user = await session.execute(select(User).where(User.id == user_id))
-    user.unique()
+    if not (ongoing := await ongoing_jam.get(session)):
+        if not (await session.execute(select(User.id).where(User.id == user_id))).first():
+            raise HTTPException(status_code=404, detail="User with specified ID could not be found.")
 
-    if not user.scalars().one_or_none():
-        raise HTTPException(status_code=404, detail="User with specified ID could not be found.")
+        raise HTTPException(status_code=404, detail="There is no ongoing codejam.")
 
-    ongoing_jam = (await session.execute(select(Jam).where(Jam.ongoing == True))).unique().scalars().one_or_none()
+    roster = await ongoing_roster.get(session, ongoing.id)
 
-    if not ongoing_jam:
-        raise HTTPException(status_code=404, detail="There is no ongoing codejam.")
+    if member := roster.members.get(user_id):
+        return render(member, UserTeamResponse)
 
-    user_teams = (await session.execute(select(TeamUser).where(TeamUser.user_id == user_id))).unique().scalars().all()
+    # Either the user isn't on a team of the ongoing jam, or the roster of this process
+    # is missing a change made by another process. Find out which in a single query.
+    ongoing_memberships = join(TeamUser, Team, (Team.id == TeamUser.team_id) & (Team.jam_id == ongoing.id))
+    memberships = await session.execute(
+        select(User.id, TeamUser.team_id, TeamUser.is_leader)
+        .select_from(User)
+        .outerjoin(ongoing_memberships, TeamUser.user_id == User.id)
+        .where(User.id == user_id)
+        .order_by(TeamUser.team_id)
+    )
 
-    current_team = None
-    for user_team in user_teams:
-        if user_team.team.jam_id == ongoing_jam.id:
-            current_team = user_team
-            break
+    if not (membership := memberships.first()):
+        raise HTTPException(status_code=404, detail="User with specified ID could not be found.")
 
-    if not current_team:
+    if membership.team_id is None:
         raise HTTPException(status_code=404, detail="User with specified ID isn't participating in ongoing codejam.")
 
-    return current_team
+    ongoing_roster.invalidate()
+    [team] = await team_documents(session, Team.id == membership.team_id)
+
+    return render(member_document(user_id, team, membership.is_leader), UserTeamResponse)
@@ -1,33 +1,37 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Response
 from sqlalchemy import func
 from sqlalchemy.future import select
 
-from api.database import DBSession, Jam, User
+from api import changes
+from api.archive import refresh_archive
+from api.database import DBReadSession, DBSession, Jam, User
 from api.database import Winner as DbWinner
+from api.documents import render, winner_document
 from api.models import Winner, WinnerResponse
+from api.response_cache import cached_route
 
-router = APIRouter(prefix="/winners", tags=["winners"])
+router = APIRouter(prefix="/winners", tags=["winners"], route_class=cached_route(changes.CODEJAMS, changes.WINNERS))
 
 
 @router.get(
     "/{jam_id}",
+    response_model=list[WinnerResponse],
     responses={404: {"description": "The specified codejam could not be found."}},
 )
-async def get_winners(jam_id: int, session: DBSession) -> list[WinnerResponse]:
+async def get_winners(jam_id: int, session: DBReadSession) -> Response:
     """Get the top ten winners from the specified codejam."""
-    jam = await session.execute(select(Jam).where(Jam.id == jam_id))
-    jam.unique()
+    jam = await session.execute(select(Jam.id).where(Jam.id == jam_id))
 
     if not jam.scalars().one_or_none():
         raise HTTPException(404, "Jam with specified ID could not be found")
 
-    winners = await session.execute(select(DbWinner).where(DbWinner.jam_id == jam_id))
-    winners.unique()
-    return winners.scalars().all()
+    winners = await session.execute(select(DbWinner.__table__).where(DbWinner.jam_id == jam_id))
+    return render([winner_document(winner) for winner in winners.all()], list[WinnerResponse])
 
 
 @router.post(
     "/{jam_id}",
+    response_model=list[WinnerResponse],
     responses={
         400: {"description": "The provided winners list is empty or contains duplicate users."},
         404: {
@@ -36,10 +40,9 @@ async def get_winners(jam_id: int, session: DBSession) -> list[WinnerResponse]:
         409: {"description": "One or more users are already a winner in the specified codejam."},
     },
 )
-async def create_winners(jam_id: int, winners: list[Winner], session: DBSession) -> list[WinnerResponse]:
+async def create_winners(jam_id: int, winners: list[Winner], session: DBSession) -> Response:
     """Add the top ten winners to the specified codejam."""
     jam = await session.execute(select(Jam).where(Jam.id == jam_id))
-    jam.unique()
 
     if not jam.scalars().one_or_none():
         raise HTTPException(404, "Jam with specified ID could not be found")
@@ -54,7 +57,6 @@ async def create_winners(jam_id: int, winners: list[Winner], session: DBSession)
 
     # Make sure all of the winners are in the user database.
     users = await session.execute(select(User).where(User.id == func.any(winner_ids)))
-    users.unique()
 
     if len(users.scalars().all()) != len(winner_ids):
         raise HTTPException(404, "Some users could not be found in the database.")
@@ -63,18 +65,14 @@ async def create_winners(jam_id: int, winners: list[Winner], session: DBSession)
     db_winners = await session.execute(
         select(DbWinner).where((DbWinner.user_id == func.any(winner_ids)) & (DbWinner.jam_id == jam_id))
     )
-    db_winners.unique()
 
     if db_winners.scalars().all():
         raise HTTPException(409, "Some winners already exist in the database.")
 
-    winners_response = []
-
-    for winner in winners:
-        db_winner = DbWinner(jam_id=jam_id, user_id=winner.user_id, first_place=winner.first_place)
-        winners_response.append(WinnerResponse.from_orm(db_winner))
-        session.add(db_winner)
-
+    await changes.publish(session, changes.WINNERS, jam_id=jam_id)
+    db_winners = [DbWinner(jam_id=jam_id, user_id=winner.user_id, first_place=winner.first_place) for winner in winners]
+    session.add_all(db_winners)
     await session.flush()
+    await refresh_archive(session, jam_id)
 
-    return winners_response
+    return render([winner_document(winner) for winner in db_winners], list[WinnerResponse])
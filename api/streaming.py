@@ -0,0 +1,34 @@
+"""Newline delimited JSON responses, for clients reading whole tables at once."""
+from typing import Annotated, Any, AsyncIterator
+
+import orjson
+from fastapi import Depends, Header
+from fastapi.responses import StreamingResponse
+
+NDJSON = "application/x-ndjson"
+
+# The documentation of the NDJSON variant of the list routes.
+NDJSON_RESPONSES = {
+    200: {
+        "content": {NDJSON: {}},
+        "description": f"With `Accept: {NDJSON}`, the items are streamed one per line instead.",
+    }
+}
+
+
+def accepts_ndjson(accept: str = Header(default="")) -> bool:
+    """A dependency telling whether the client asked for a stream of newline delimited JSON documents."""
+    return any(media_range.split(";")[0].strip().lower() == NDJSON for media_range in accept.split(","))
+
+
+AcceptsNDJSON = Annotated[bool, Depends(accepts_ndjson)]
+
+
+def ndjson_response(documents: AsyncIterator[dict[str, Any]]) -> StreamingResponse:
+    """Stream the documents one per line, as they are produced."""
+
+    async def lines() -> AsyncIterator[bytes]:
+        async for document in documents:
+            yield orjson.dumps(document, option=orjson.OPT_APPEND_NEWLINE)
+
+    return StreamingResponse(lines(), media_type=NDJSON)
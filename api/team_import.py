@@ -0,0 +1,142 @@
+"""
+Incremental parsing of streamed team uploads.
+
+Two formats are supported:
+
+- NDJSON (`application/x-ndjson`): one team per line, in the same format as the teams of a new code jam.
+- CSV (`text/csv`): a header row with the `CSV_COLUMNS`, followed by one row per team member.
+  The rows of a team must be consecutive. The Discord identifiers are taken from the first row of each team.
+  Quoted values may not span several lines.
+"""
+import codecs
+import csv
+from typing import AsyncIterator, NamedTuple, Optional
+
+from pydantic import ValidationError
+
+from api import models
+from api.streaming import NDJSON
+
+CSV = "text/csv"
+CONTENT_TYPES = (NDJSON, CSV)
+
+CSV_COLUMNS = ("name", "discord_role_id", "discord_channel_id", "user_id", "is_leader")
+
+
+class ParsedTeam(NamedTuple):
+    """A team read from an upload, or the reason it couldn't be read."""
+
+    line: int
+    team: Optional[models.Team] = None
+    error: Optional[str] = None
+
+
+def format_validation_error(error: ValidationError) -> str:
+    """Summarize the errors of a pydantic validation error on a single line."""
+    return "; ".join(f"{'.'.join(map(str, e['loc']))}: {e['msg']}" for e in error.errors())
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[tuple[int, str]]:
+    """Decode a stream of UTF-8 chunks and yield each non-blank line along with its line number."""
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    buffer = ""
+    line_number = 0
+
+    async for chunk in chunks:
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+
+        for line in lines:
+            line_number += 1
+            if line.strip():
+                yield line_number, line.rstrip("\r")
+
+    buffer += decoder.decode(b"", final=True)
+    if buffer.strip():
+        yield line_number + 1, buffer.rstrip("\r")
+
+
+async def parse_ndjson(lines: AsyncIterator[tuple[int, str]]) -> AsyncIterator[ParsedTeam]:
+    """Parse one team per line."""
+    async for line_number, line in lines:
+        try:
+            yield ParsedTeam(line_number, team=models.Team.parse_raw(line))
+        except ValidationError as e:
+            yield ParsedTeam(line_number, error=format_validation_error(e))
+
+
+async def parse_csv(lines: AsyncIterator[tuple[int, str]]) -> AsyncIterator[ParsedTeam]:
+    """Parse one team member per row, grouping consecutive rows of the same team."""
+    header = None
+    # The first line of the team being read, its raw row fields, and its parsed members.
+    team_line, team_row, members, member_errors = 0, {}, [], []
+
+    def finish_team() -> ParsedTeam:
+        if member_errors:
+            return ParsedTeam(team_line, error="; ".join(member_errors))
+
+        try:
+            team = models.Team(
+                name=team_row["name"],
+                users=members,
+                discord_role_id=team_row["discord_role_id"] or None,
+                discord_channel_id=team_row["discord_channel_id"] or None,
+            )
+        except ValidationError as e:
+            return ParsedTeam(team_line, error=format_validation_error(e))
+
+        return ParsedTeam(team_line, team=team)
+
+    async for line_number, line in lines:
+        fields = next(csv.reader([line]))
+
+        if header is None:
+            if missing := set(CSV_COLUMNS) - set(fields):
+                yield ParsedTeam(line_number, error=f"The header is missing the columns {sorted(missing)}.")
+                return
+            header = fields
+            continue
+
+        if len(fields) != len(header):
+            yield ParsedTeam(line_number, error=f"Expected {len(header)} columns, found {len(fields)}.")
+            continue
+
+        row = dict(zip(header, fields))
+        if team_row and row["name"] != team_row["name"]:
+            yield finish_team()
+            team_row = {}
+
+        if not team_row:
+            team_line, team_row, members, member_errors = line_number, row, [], []
+
+        try:
+            members.append(models.User(user_id=row["user_id"], is_leader=row["is_leader"]))
+        except ValidationError as e:
+            member_errors.append(f"line {line_number}: {format_validation_error(e)}")
+
+    if team_row:
+        yield finish_team()
+
+
+async def parse_teams(content_type: str, chunks: AsyncIterator[bytes]) -> AsyncIterator[ParsedTeam]:
+    """
+    Parse the teams of an upload in the given format.
+
+    Teams with a name that already appeared in the upload, or with a member listed twice, are reported as errors.
+    """
+    parser = parse_ndjson if content_type == NDJSON else parse_csv
+    seen_names = set()
+
+    async for parsed in parser(iter_lines(chunks)):
+        if parsed.team is not None:
+            name = parsed.team.name.lower()
+            user_ids = [user.user_id for user in parsed.team.users]
+
+            if name in seen_names:
+                parsed = ParsedTeam(parsed.line, error="A team with this name already appeared in the upload.")
+            elif len(set(user_ids)) != len(user_ids):
+                parsed = ParsedTeam(parsed.line, error="The team contains one or more duplicate users.")
+
+            seen_names.add(name)
+
+        yield parsed
@@ -0,0 +1,122 @@
+"""
+Compare the time taken to render the largest responses with the stdlib and the orjson response classes.
+
+The dataset is generated from a fixed seed, with the size of a large code jam.
+Two paths are measured for each response:
+
+- models: the route returns a response model, which FastAPI converts with `jsonable_encoder` before rendering it.
+- documents: the route returns a document built from Core rows, which is rendered as it is.
+
+Run it from the root of the repository, with the same environment as the API:
+
+    python -m benchmarks.serialization
+"""
+import random
+import statistics
+import timeit
+from functools import partial
+from typing import Any, Callable
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+from starlette.responses import Response
+
+from api.models import CodeJamResponse, InfractionType, UserResponse
+
+SEED = 3402
+TEAMS = 600
+USERS_PER_TEAM = 5
+INFRACTIONS = 300
+WINNERS = 10
+REPEAT = 20
+
+
+def generate_codejam(rng: random.Random) -> dict[str, Any]:
+    """Generate the document of a code jam."""
+    user_ids = rng.sample(range(10**17, 10**18), TEAMS * USERS_PER_TEAM)
+    members = iter(user_ids)
+    teams = [
+        {
+            "name": f"Team {team_id}",
+            "users": [{"user_id": next(members), "is_leader": index == 0} for index in range(USERS_PER_TEAM)],
+            "discord_role_id": rng.randrange(10**17, 10**18),
+            "discord_channel_id": rng.randrange(10**17, 10**18),
+            "id": team_id,
+            "jam_id": 1,
+        }
+        for team_id in range(TEAMS)
+    ]
+    infractions = [
+        {
+            "user_id": rng.choice(user_ids),
+            "jam_id": 1,
+            "reason": "Breaking the rules. " * rng.randrange(1, 10),
+            "infraction_type": rng.choice(list(InfractionType)).value,
+            "id": infraction_id,
+        }
+        for infraction_id in range(INFRACTIONS)
+    ]
+    winners = [{"user_id": user_id, "first_place": True} for user_id in rng.sample(user_ids, WINNERS)]
+
+    return {
+        "name": "Benchmark Jam",
+        "teams": teams,
+        "ongoing": True,
+        "id": 1,
+        "infractions": infractions,
+        "winners": winners,
+    }
+
+
+def user_documents(codejam: dict[str, Any]) -> list[dict[str, Any]]:
+    """Build the documents of the participants of the code jam."""
+    infractions = {}
+    for infraction in codejam["infractions"]:
+        infractions.setdefault(infraction["user_id"], []).append(infraction)
+
+    winners = {winner["user_id"]: winner["first_place"] for winner in codejam["winners"]}
+
+    return [
+        {
+            "id": user["user_id"],
+            "participation_history": [
+                {
+                    "jam_id": codejam["id"],
+                    "top_10": user["user_id"] in winners,
+                    "first_place": winners.get(user["user_id"], False),
+                    "team_id": team["id"],
+                    "is_leader": user["is_leader"],
+                    "infractions": infractions.get(user["user_id"], []),
+                }
+            ],
+        }
+        for team in codejam["teams"]
+        for user in team["users"]
+    ]
+
+
+def measure(response_class: type[Response], content: Callable[[], Any]) -> float:
+    """Get the median time, in milliseconds, taken to get the `content` and render it with `response_class`."""
+    times = timeit.repeat(lambda: response_class(content()), number=1, repeat=REPEAT)
+    return statistics.median(times) * 1000
+
+
+def main() -> None:
+    """Print the time taken by each response class on each path."""
+    codejam = generate_codejam(random.Random(SEED))
+    users = user_documents(codejam)
+    cases = {
+        "CodeJamResponse": (CodeJamResponse(**codejam), codejam),
+        "list[UserResponse]": ([UserResponse(**user) for user in users], users),
+    }
+
+    print(f"{'response':<20}{'path':<12}{'json (ms)':>12}{'orjson (ms)':>14}{'speedup':>10}")
+    for name, (model, document) in cases.items():
+        for path, content in (("models", partial(jsonable_encoder, model)), ("documents", document.copy)):
+            before = measure(JSONResponse, content)
+            after = measure(ORJSONResponse, content)
+            print(f"{name:<20}{path:<12}{before:>12.2f}{after:>14.2f}{before / after:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+"""Add resource versions
+
+Revision ID: 4f1d2c8e6a3b
+Revises: 959bac3807c3
+Create Date: 2026-10-18 16:05:12.204337
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "4f1d2c8e6a3b"
+down_revision = "959bac3807c3"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "resource_versions",
+        sa.Column("resource", sa.Text(), nullable=False),
+        sa.Column("version", sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint("resource"),
+    )
+
+
+def downgrade():
+    op.drop_table("resource_versions")
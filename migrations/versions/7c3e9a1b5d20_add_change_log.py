@@ -0,0 +1,36 @@
+"""Add change log
+
+Revision ID: 7c3e9a1b5d20
+Revises: 4f1d2c8e6a3b
+Create Date: 2026-10-18 17:21:48.913055
+
+"""
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = "7c3e9a1b5d20"
+down_revision = "4f1d2c8e6a3b"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "changes",
+        sa.Column("id", sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column("transaction_id", sa.BigInteger(), server_default=sa.text("txid_current()"), nullable=False),
+        sa.Column("changed_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=False),
+        sa.Column("resources", postgresql.ARRAY(sa.Text()), nullable=False),
+        sa.Column("jam_id", sa.Integer(), nullable=True),
+        sa.Column("team_id", sa.Integer(), nullable=True),
+        sa.Column("user_id", sa.BigInteger(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_changes_transaction_id_id", "changes", ["transaction_id", "id"])
+
+
+def downgrade():
+    op.drop_index("ix_changes_transaction_id_id", "changes")
+    op.drop_table("changes")
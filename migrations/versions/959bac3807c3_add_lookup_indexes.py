@@ -0,0 +1,35 @@
+"""Add lookup indexes
+
+Revision ID: 959bac3807c3
+Revises: 3bb5cc4b5d48
+Create Date: 2026-10-18 10:12:41.518203
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "959bac3807c3"
+down_revision = "3bb5cc4b5d48"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        "ix_team_has_user_user_id", "team_has_user", ["user_id", "team_id"], postgresql_include=["is_leader"]
+    )
+    op.create_index("ix_teams_jam_id", "teams", ["jam_id"])
+    op.create_index("ix_infractions_user_id_jam_id", "infractions", ["user_id", "jam_id"])
+    op.create_index("ix_infractions_jam_id", "infractions", ["jam_id"])
+    op.create_index("ix_winners_user_id", "winners", ["user_id"])
+    op.create_index("ix_jams_ongoing", "jams", ["id"], postgresql_where=sa.text("ongoing"))
+
+
+def downgrade():
+    op.drop_index("ix_jams_ongoing", "jams")
+    op.drop_index("ix_winners_user_id", "winners")
+    op.drop_index("ix_infractions_jam_id", "infractions")
+    op.drop_index("ix_infractions_user_id_jam_id", "infractions")
+    op.drop_index("ix_teams_jam_id", "teams")
+    op.drop_index("ix_team_has_user_user_id", "team_has_user")
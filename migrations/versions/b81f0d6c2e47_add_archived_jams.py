@@ -0,0 +1,30 @@
+"""Add archived jams
+
+Revision ID: b81f0d6c2e47
+Revises: 7c3e9a1b5d20
+Create Date: 2026-10-18 19:02:36.571948
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "b81f0d6c2e47"
+down_revision = "7c3e9a1b5d20"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "archived_jams",
+        sa.Column("jam_id", sa.Integer(), nullable=False),
+        sa.Column("archived_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=False),
+        sa.Column("document", sa.LargeBinary(), nullable=False),
+        sa.ForeignKeyConstraint(["jam_id"], ["jams.id"]),
+        sa.PrimaryKeyConstraint("jam_id"),
+    )
+
+
+def downgrade():
+    op.drop_table("archived_jams")
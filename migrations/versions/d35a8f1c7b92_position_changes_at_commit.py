@@ -0,0 +1,36 @@
+"""Position changes at commit
+
+Revision ID: d35a8f1c7b92
+Revises: b81f0d6c2e47
+Create Date: 2026-10-18 21:44:12.305817
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "d35a8f1c7b92"
+down_revision = "b81f0d6c2e47"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute(sa.schema.CreateSequence(sa.Sequence("change_positions")))
+    op.add_column("changes", sa.Column("position", sa.BigInteger(), nullable=True))
+    # The existing changes keep the order they were listed in.
+    op.execute(
+        """
+        UPDATE changes SET position = ordered.position
+        FROM (SELECT id, row_number() OVER (ORDER BY transaction_id, id) AS position FROM changes) AS ordered
+        WHERE changes.id = ordered.id
+        """
+    )
+    op.execute("SELECT setval('change_positions', max(position)) FROM changes HAVING count(*) > 0")
+    op.create_index("ix_changes_position_id", "changes", ["position", "id"])
+
+
+def downgrade():
+    op.drop_index("ix_changes_position_id", "changes")
+    op.drop_column("changes", "position")
+    op.execute(sa.schema.DropSequence(sa.Sequence("change_positions")))
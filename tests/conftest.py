@@ -10,10 +10,13 @@ from httpx import AsyncClient
 from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
 
+from api import changes
 from api.constants import Config
 from api.database import Base
-from api.dependencies import get_db_session
+from api.dependencies import get_db_read_session, get_db_session
 from api.main import app as main_app
+from api.ongoing import ongoing_jam, ongoing_roster, ongoing_snapshot
+from api.response_cache import response_cache
 
 test_engine = create_async_engine(Config.DATABASE_URL, future=True, isolation_level="AUTOCOMMIT")
 
@@ -49,6 +52,17 @@ async def session(create_test_database_engine: AsyncEngine) -> AsyncSession:
             await session.close()
 
 
+@pytest.fixture(autouse=True)
+def reset_caches() -> None:
+    """Clear the in-process caches, as every test starts with an empty database."""
+    ongoing_jam.invalidate()
+    ongoing_roster.invalidate()
+    ongoing_snapshot.invalidate()
+    response_cache.clear()
+    changes.known_versions.clear()
+    yield
+
+
 @pytest.fixture()
 def override_db_session(session: AsyncSession) -> AsyncSession:
     """Yields back the modified Database session that uses the correspondent Database."""
@@ -63,6 +77,7 @@ def override_db_session(session: AsyncSession) -> AsyncSession:
 def app(override_db_session: Callable) -> FastAPI:
     """Overrides the default FastAPI app to use the overridden DB session."""
     main_app.dependency_overrides[get_db_session] = override_db_session
+    main_app.dependency_overrides[get_db_read_session] = override_db_session
     yield main_app
 
 
@@ -0,0 +1,106 @@
+"""Tests for the batch router."""
+import pytest
+from fastapi import FastAPI
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api import models
+
+pytestmark = pytest.mark.asyncio
+
+
+def workflow(app: FastAPI, codejam: models.CodeJamResponse, team_id: int) -> list[dict]:
+    """Build the operations creating a user, adding it to a team and recording an infraction for it."""
+    infraction = {"user_id": 4242, "jam_id": codejam.id, "reason": "Too fast.", "infraction_type": "note"}
+    return [
+        {"method": "POST", "path": app.url_path_for("create_user", user_id=4242)},
+        {
+            "method": "POST",
+            "path": app.url_path_for("add_user_to_team", team_id=team_id, user_id=4242) + "?is_leader=1",
+        },
+        {"method": "POST", "path": app.url_path_for("create_infraction"), "body": infraction},
+    ]
+
+
+async def test_batch_runs_operations_in_order(
+    client: AsyncClient, app: FastAPI, created_codejam: models.CodeJamResponse
+) -> None:
+    """Each operation should see the changes of the previous ones, and the batch should be committed."""
+    team_id = created_codejam.teams[0].id
+    response = await client.post(app.url_path_for("run_batch"), json=workflow(app, created_codejam, team_id))
+    assert response.status_code == 200
+
+    batch = models.BatchResponse(**response.json())
+    assert batch.committed
+    assert [result.status_code for result in batch.results] == [200, 200, 200]
+    assert batch.results[1].body == {"user_id": 4242, "is_leader": True}
+    assert batch.results[2].body["reason"] == "Too fast."
+
+    user = await client.get(app.url_path_for("get_user", user_id=4242))
+    assert user.json()["participation_history"][0]["infractions"] == [batch.results[2].body]
+
+
+async def test_batch_is_rolled_back_on_failure(
+    client: AsyncClient, app: FastAPI, created_codejam: models.CodeJamResponse
+) -> None:
+    """A failing operation should stop the batch and roll back the changes of the previous ones."""
+    response = await client.post(app.url_path_for("run_batch"), json=workflow(app, created_codejam, 123456))
+    assert response.status_code == 200
+
+    batch = models.BatchResponse(**response.json())
+    assert not batch.committed
+    assert [result.status_code for result in batch.results] == [200, 404]
+    assert batch.results[1].body == {"detail": "Team with specified ID could not be found."}
+
+    user = await client.get(app.url_path_for("get_user", user_id=4242))
+    assert user.status_code == 404
+
+
+@pytest.mark.parametrize(
+    ("operation", "status_code"),
+    [
+        ({"method": "GET", "path": "/unknown"}, 404),
+        ({"method": "PUT", "path": "/users/"}, 405),
+        ({"method": "POST", "path": "/batch/", "body": []}, 400),
+        ({"method": "POST", "path": "/infractions/", "body": {"user_id": 1}}, 422),
+    ],
+)
+async def test_batch_reports_invalid_operations(
+    client: AsyncClient, app: FastAPI, operation: dict, status_code: int
+) -> None:
+    """Operations that can't be routed or are invalid should get the status code they would get on their own."""
+    response = await client.post(app.url_path_for("run_batch"), json=[operation])
+    assert response.json()["results"][0]["status_code"] == status_code
+
+
+@pytest.mark.parametrize(("route", "accept"), [("get_events", "*/*"), ("get_teams", "application/x-ndjson")])
+async def test_batch_rejects_streamed_responses(client: AsyncClient, app: FastAPI, route: str, accept: str) -> None:
+    """Streamed responses, which could hold the transaction of the batch indefinitely, should be refused."""
+    operations = [{"method": "GET", "path": app.url_path_for(route)}]
+    response = await client.post(app.url_path_for("run_batch"), json=operations, headers={"Accept": accept})
+
+    [result] = response.json()["results"]
+    assert result["status_code"] == 400
+
+
+async def test_batch_reads_are_not_cached(
+    client: AsyncClient, app: FastAPI, session: AsyncSession, created_codejam: models.CodeJamResponse
+) -> None:
+    """What the operations of a batch read from its uncommitted changes shouldn't be cached for other requests."""
+    await session.commit()
+    operations = [
+        {
+            "method": "PATCH",
+            "path": app.url_path_for("modify_codejam", codejam_id=created_codejam.id) + "?name=Renamed",
+        },
+        {"method": "GET", "path": app.url_path_for("get_ongoing_codejam_snapshot")},
+        {"method": "GET", "path": app.url_path_for("get_team", team_id=123456)},
+    ]
+
+    response = await client.post(app.url_path_for("run_batch"), json=operations)
+    batch = models.BatchResponse(**response.json())
+    assert not batch.committed
+    assert batch.results[1].body["name"] == "Renamed"
+
+    snapshot = await client.get(app.url_path_for("get_ongoing_codejam_snapshot"))
+    assert snapshot.json()["name"] == created_codejam.name
@@ -1,4 +1,6 @@
 """Tests for the codejams router."""
+from typing import AsyncIterator
+
 import pytest
 from fastapi import FastAPI
 from httpx import AsyncClient
@@ -6,7 +8,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
 from api import models
-from api.database import User
+from api.database import ArchivedJam, User
 
 pytestmark = pytest.mark.asyncio
 
@@ -16,10 +18,11 @@ pytestmark = pytest.mark.asyncio
 async def test_list_codejams_without_db_entries(client: AsyncClient, app: FastAPI) -> None:
     """No codejams should be returned when the database is empty."""
     response = await client.get(app.url_path_for("get_codejams"))
-    jams = response.json()
+    page = models.CodeJamPage(**response.json())
 
     assert response.status_code == 200
-    assert not jams
+    assert not page.codejams
+    assert page.next_cursor is None
 
 
 async def test_get_nonexistent_code_jam(client: AsyncClient, app: FastAPI) -> None:
@@ -57,18 +60,54 @@ async def test_get_existing_code_jam(
 async def test_list_codejams_with_existing_jam(
     client: AsyncClient, created_codejam: models.CodeJamResponse, app: FastAPI
 ) -> None:
-    """Listing all code jams should return the created jam."""
+    """Listing all code jams should return a summary of the created jam."""
     response = await client.get(app.url_path_for("get_codejams"))
     assert response.status_code == 200
-    raw = response.json()
+    page = models.CodeJamPage(**response.json())
 
     # We should only have a single jam here.
     # Pattern match to make sure that is true.
-    [jam] = [models.CodeJamResponse(**jam) for jam in raw]
+    [jam] = page.codejams
+    assert page.next_cursor is None
 
-    # Ensure the code jam in the "single jam" endpoint matches the
-    # code jam we get returned from the API here.
-    assert jam == created_codejam
+    assert jam.id == created_codejam.id
+    assert jam.name == created_codejam.name
+    assert jam.ongoing == created_codejam.ongoing
+    assert jam.team_count == len(created_codejam.teams)
+    assert jam.user_count == sum(len(team.users) for team in created_codejam.teams)
+    assert jam.infraction_count == 0
+
+
+async def test_list_codejams_paginates_newest_first(
+    client: AsyncClient, created_codejam: models.CodeJamResponse, app: FastAPI
+) -> None:
+    """Following the cursor of each page should list every code jam exactly once, newest first."""
+    for name in ("CodeJam Test 2", "CodeJam Test 3"):
+        response = await client.post(app.url_path_for("create_codejam"), json={"name": name, "teams": []})
+        assert response.status_code == 200
+
+    seen = []
+    params = {"limit": 2}
+    while True:
+        response = await client.get(app.url_path_for("get_codejams"), params=params)
+        assert response.status_code == 200
+        page = models.CodeJamPage(**response.json())
+        assert len(page.codejams) <= 2
+        seen.extend(jam.id for jam in page.codejams)
+
+        if page.next_cursor is None:
+            break
+        params["after"] = page.next_cursor
+
+    assert len(seen) == 3
+    assert seen == sorted(seen, reverse=True)
+    assert seen[-1] == created_codejam.id
+
+
+async def test_list_codejams_rejects_invalid_cursor(client: AsyncClient, app: FastAPI) -> None:
+    """Passing a cursor that was not produced by the API should return a 400."""
+    response = await client.get(app.url_path_for("get_codejams"), params={"after": "not a cursor"})
+    assert response.status_code == 400
 
 
 async def test_get_ongoing_codejam(client: AsyncClient, created_codejam: models.CodeJamResponse, app: FastAPI) -> None:
@@ -81,6 +120,73 @@ async def test_get_ongoing_codejam(client: AsyncClient, created_codejam: models.
     assert jam == created_codejam
 
 
+async def test_ongoing_codejam_follows_changes(
+    client: AsyncClient, created_codejam: models.CodeJamResponse, app: FastAPI
+) -> None:
+    """The ongoing code jam should reflect new ongoing code jams and modifications right away."""
+    response = await client.get(app.url_path_for("get_codejam", codejam_id=-1))
+    assert response.json()["id"] == created_codejam.id
+
+    response = await client.post(
+        app.url_path_for("create_codejam"), json={"name": "CodeJam Test", "teams": [], "ongoing": True}
+    )
+    new_codejam_id = response.json()["id"]
+
+    response = await client.get(app.url_path_for("get_codejam", codejam_id=-1))
+    assert response.json()["id"] == new_codejam_id
+
+    response = await client.patch(
+        app.url_path_for("modify_codejam", codejam_id=created_codejam.id), params={"ongoing": True}
+    )
+    assert response.status_code == 200
+
+    response = await client.get(app.url_path_for("get_codejam", codejam_id=-1))
+    assert response.json()["id"] == created_codejam.id
+
+    response = await client.get(app.url_path_for("get_teams"), params={"current_jam": True})
+    assert [team["id"] for team in response.json()] == [team.id for team in created_codejam.teams]
+
+
+async def test_get_ongoing_codejam_snapshot(
+    client: AsyncClient, created_codejam: models.CodeJamResponse, app: FastAPI
+) -> None:
+    """The snapshot should have the teams of the ongoing codejam and the team of each participant."""
+    response = await client.get(app.url_path_for("get_ongoing_codejam_snapshot"))
+    assert response.status_code == 200
+
+    snapshot = models.CodeJamSnapshot(**response.json())
+    assert (snapshot.id, snapshot.name, snapshot.teams) == (
+        created_codejam.id,
+        created_codejam.name,
+        created_codejam.teams,
+    )
+    assert snapshot.members == {user.user_id: team.id for team in created_codejam.teams for user in team.users}
+
+
+async def test_ongoing_codejam_snapshot_follows_changes(
+    client: AsyncClient, created_codejam: models.CodeJamResponse, app: FastAPI
+) -> None:
+    """The snapshot should be rebuilt when the teams or the ongoing codejam change."""
+    team = created_codejam.teams[0]
+    await client.get(app.url_path_for("get_ongoing_codejam_snapshot"))
+
+    await client.delete(app.url_path_for("remove_user_from_team", team_id=team.id, user_id=team.users[0].user_id))
+    snapshot = (await client.get(app.url_path_for("get_ongoing_codejam_snapshot"))).json()
+    assert str(team.users[0].user_id) not in snapshot["members"]
+
+    response = await client.post(
+        app.url_path_for("create_codejam"), json={"name": "CodeJam Test", "teams": [], "ongoing": True}
+    )
+    snapshot = (await client.get(app.url_path_for("get_ongoing_codejam_snapshot"))).json()
+    assert (snapshot["id"], snapshot["teams"], snapshot["members"]) == (response.json()["id"], [], {})
+
+
+async def test_get_nonexistent_ongoing_codejam_snapshot(client: AsyncClient, app: FastAPI) -> None:
+    """Getting the snapshot without an ongoing code jam should return a 404."""
+    response = await client.get(app.url_path_for("get_ongoing_codejam_snapshot"))
+    assert response.status_code == 404
+
+
 async def test_create_codejams_rejects_invalid_data(client: AsyncClient, app: FastAPI) -> None:
     """Posting invalid JSON data should return 422."""
     response = await client.post(app.url_path_for("create_codejam"), json={"name": "test"})
@@ -111,6 +217,34 @@ async def test_create_codejams_accepts_valid_data_and_creates_user(
     assert (await session.execute(select(User).where(User.id == 1))).scalars().unique().one_or_none()
 
 
+async def test_create_codejam_with_existing_and_shared_users(client: AsyncClient, app: FastAPI) -> None:
+    """Creating a code jam should reuse existing users and allow a user to be on several of its teams."""
+    response = await client.post(app.url_path_for("create_user", user_id=1))
+    assert response.status_code == 200
+
+    codejam = models.CodeJam(
+        name="CodeJam Test",
+        teams=[
+            models.Team(name="Dramatic Dragonflies", users=[models.User(user_id=1, is_leader=True)]),
+            models.Team(
+                name="Gallant Grasshoppers",
+                users=[models.User(user_id=1, is_leader=False), models.User(user_id=2, is_leader=True)],
+            ),
+        ],
+    )
+    response = await client.post(app.url_path_for("create_codejam"), json=codejam.dict())
+    assert response.status_code == 200
+
+    created = models.CodeJamResponse(**response.json())
+    teams = {team.name: team for team in created.teams}
+    assert teams.keys() == {team.name for team in codejam.teams}
+    for team in codejam.teams:
+        assert sorted(teams[team.name].users, key=lambda user: user.user_id) == team.users
+
+    response = await client.get(app.url_path_for("get_user", user_id=2))
+    assert response.status_code == 200
+
+
 async def test_modify_codejam(client: AsyncClient, app: FastAPI, created_codejam: models.CodeJamResponse) -> None:
     """Modifying an existing code jam should return 200."""
     response = await client.patch(
@@ -141,3 +275,129 @@ async def test_set_ongoing_codejam_to_new_codejam(
     response = await client.get(app.url_path_for("get_codejam", codejam_id=created_codejam.id))
     assert response.status_code == 200
     return response.json()["ongoing"] is False
+
+
+async def chunked(body: str, size: int = 7) -> AsyncIterator[bytes]:
+    """Yield the encoded body in small chunks, splitting lines and characters across chunks."""
+    encoded = body.encode()
+    while encoded:
+        chunk, encoded = encoded[:size], encoded[size:]
+        yield chunk
+
+
+async def test_import_teams_from_ndjson(
+    client: AsyncClient, app: FastAPI, created_codejam: models.CodeJamResponse
+) -> None:
+    """Importing NDJSON teams should create the valid teams and report the others by line."""
+    lines = [
+        models.Team(name="Überraschende Uhus", users=[models.User(user_id=1, is_leader=True)]).json(),
+        "{not json",
+        models.Team(name=created_codejam.teams[0].name.upper(), users=[]).json(),
+        "",
+        models.Team(name="Wise Wombats", users=[models.User(user_id=1337, is_leader=False)]).json(),
+        models.Team(name="wise wombats", users=[]).json(),
+    ]
+    response = await client.post(
+        app.url_path_for("import_teams", codejam_id=created_codejam.id),
+        content=chunked("\n".join(lines)),
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+    assert response.status_code == 200
+
+    result = models.TeamImportResponse(**response.json())
+    assert len(result.created) == 2
+    assert [error.line for error in result.errors] == [2, 3, 6]
+
+    response = await client.get(app.url_path_for("get_current_team", user_id=1))
+    assert response.status_code == 200
+    assert response.json()["team"]["id"] == result.created[0]
+    assert response.json()["team"]["name"] == "Überraschende Uhus"
+
+
+async def test_import_teams_from_csv(
+    client: AsyncClient, app: FastAPI, created_codejam: models.CodeJamResponse
+) -> None:
+    """Importing CSV members should group consecutive rows into teams."""
+    body = "\n".join(
+        [
+            "name,user_id,is_leader,discord_role_id,discord_channel_id",
+            "Curious Capybaras,10,true,5,6",
+            "Curious Capybaras,11,false,,",
+            '"Nimble Newts, Inc.",12,true,,',
+            "Broken Bees,not a number,true,,",
+            "Broken Bees,13,false,,",
+        ]
+    )
+    response = await client.post(
+        app.url_path_for("import_teams", codejam_id=created_codejam.id),
+        content=chunked(body),
+        headers={"Content-Type": "text/csv; charset=utf-8"},
+    )
+    assert response.status_code == 200
+
+    result = models.TeamImportResponse(**response.json())
+    assert len(result.created) == 2
+    [error] = result.errors
+    assert error.line == 5
+
+    response = await client.get(app.url_path_for("get_team", team_id=result.created[0]))
+    team = models.TeamResponse(**response.json())
+    assert team.name == "Curious Capybaras"
+    assert (team.discord_role_id, team.discord_channel_id) == (5, 6)
+    assert sorted((user.user_id, user.is_leader) for user in team.users) == [(10, True), (11, False)]
+
+
+async def test_import_teams_rejects_unknown_content_type(
+    client: AsyncClient, app: FastAPI, created_codejam: models.CodeJamResponse
+) -> None:
+    """Uploading teams in an unsupported format should return a 415."""
+    response = await client.post(
+        app.url_path_for("import_teams", codejam_id=created_codejam.id), json=[{"name": "Team", "users": []}]
+    )
+    assert response.status_code == 415
+
+
+async def test_import_teams_into_nonexistent_codejam(client: AsyncClient, app: FastAPI) -> None:
+    """Uploading teams to a nonexistent code jam should return a 404."""
+    response = await client.post(
+        app.url_path_for("import_teams", codejam_id=41902),
+        content=b"",
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+    assert response.status_code == 404
+
+
+async def test_archive_codejam(
+    client: AsyncClient, app: FastAPI, created_codejam: models.CodeJamResponse, session: AsyncSession
+) -> None:
+    """Archived code jams should be served as they were archived, and follow the changes made to them."""
+    url = app.url_path_for("get_codejam", codejam_id=created_codejam.id)
+    archive_url = app.url_path_for("archive_codejam", codejam_id=created_codejam.id)
+    assert (await client.post(archive_url)).status_code == 409
+
+    await client.post(app.url_path_for("create_codejam"), json={"name": "Next Jam", "teams": [], "ongoing": True})
+    archived = await client.post(archive_url)
+    assert archived.status_code == 200
+    assert archived.json() == {**created_codejam.dict(), "ongoing": False}
+
+    response = await client.get(url)
+    assert response.json() == archived.json()
+    assert response.headers["Cache-Control"].startswith("private, max-age=")
+
+    winner = {"user_id": created_codejam.teams[0].users[0].user_id, "first_place": True}
+    await client.post(app.url_path_for("create_winners", jam_id=created_codejam.id), json=[winner])
+    response = await client.get(url)
+    assert response.json()["winners"] == [winner]
+    assert "Cache-Control" in response.headers
+
+    await client.patch(app.url_path_for("modify_codejam", codejam_id=created_codejam.id), params={"ongoing": True})
+    assert (await session.execute(select(ArchivedJam))).scalars().all() == []
+    response = await client.get(url)
+    assert response.json()["ongoing"]
+    assert "Cache-Control" not in response.headers
+
+
+async def test_archive_nonexistent_codejam(client: AsyncClient, app: FastAPI) -> None:
+    """Archiving a nonexistent code jam should return a 404."""
+    response = await client.post(app.url_path_for("archive_codejam", codejam_id=41))
+    assert response.status_code == 404
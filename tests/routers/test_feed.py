@@ -0,0 +1,90 @@
+"""Tests for the change feed router."""
+import pytest
+from fastapi import FastAPI
+from httpx import AsyncClient
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from api import models
+from api.constants import Config
+from api.database import Change
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_get_changes_without_changes(client: AsyncClient, app: FastAPI) -> None:
+    """Without any change, the feed should be empty and give a cursor to resume from."""
+    response = await client.get(app.url_path_for("get_changes"))
+    assert response.status_code == 200
+
+    page = models.ChangePage(**response.json())
+    assert page.changes == []
+    assert not page.has_more
+
+    resumed = await client.get(app.url_path_for("get_changes"), params={"since": page.cursor})
+    assert resumed.json()["changes"] == []
+
+
+async def test_get_changes_pages_through_changes(
+    client: AsyncClient, app: FastAPI, session: AsyncSession, created_codejam: models.CodeJamResponse
+) -> None:
+    """Changes should be returned in order, resuming after the cursor of the previous page."""
+    await client.post(app.url_path_for("create_user", user_id=4242))
+    # Changes are only listed once their transaction commits.
+    await session.commit()
+
+    first = models.ChangePage(**(await client.get(app.url_path_for("get_changes"), params={"limit": 1})).json())
+    assert first.has_more
+    assert [(change.resources, change.jam_id) for change in first.changes] == [
+        (["codejams", "teams", "users"], created_codejam.id)
+    ]
+
+    second = (await client.get(app.url_path_for("get_changes"), params={"since": first.cursor})).json()
+    assert not second["has_more"]
+    assert [(change["resources"], change["user_id"]) for change in second["changes"]] == [(["users"], 4242)]
+
+    last = await client.get(app.url_path_for("get_changes"), params={"since": second["cursor"]})
+    assert last.json()["changes"] == []
+    assert last.json()["cursor"] == second["cursor"]
+
+
+async def test_get_changes_orders_by_position(client: AsyncClient, app: FastAPI, session: AsyncSession) -> None:
+    """Changes should be ordered by their position, and only listed once positioned by their commit."""
+    session.add_all(
+        [
+            Change(position=3, resources=["teams"], team_id=1),
+            Change(position=2, resources=["users"], user_id=1),
+            Change(resources=["winners"], jam_id=1),
+        ]
+    )
+    await session.flush()
+
+    response = await client.get(app.url_path_for("get_changes"))
+    assert [change["resources"] for change in response.json()["changes"]] == [["users"], ["teams"]]
+
+
+async def test_get_changes_during_concurrent_transactions(
+    client: AsyncClient, app: FastAPI, session: AsyncSession
+) -> None:
+    """Committed changes should be listed right away, even while earlier transactions are still running."""
+    engine = create_async_engine(Config.DATABASE_URL, poolclass=NullPool)
+    try:
+        async with engine.begin() as connection:
+            # Any transaction of the cluster, which holds back its oldest running transaction.
+            await connection.execute(select(func.txid_current()))
+
+            await client.post(app.url_path_for("create_user", user_id=4242))
+            await session.commit()
+
+            response = await client.get(app.url_path_for("get_changes"))
+            assert [change["user_id"] for change in response.json()["changes"]] == [4242]
+    finally:
+        await engine.dispose()
+
+
+@pytest.mark.parametrize("since", ["invalid", "MQ=="])
+async def test_get_changes_with_invalid_cursor(client: AsyncClient, app: FastAPI, since: str) -> None:
+    """An invalid cursor should return a 400."""
+    response = await client.get(app.url_path_for("get_changes"), params={"since": since})
+    assert response.status_code == 400
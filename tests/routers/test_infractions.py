@@ -1,4 +1,6 @@
 """Tests for the infractions router."""
+import json
+
 import pytest
 from fastapi import FastAPI
 from httpx import AsyncClient
@@ -16,6 +18,24 @@ async def test_list_infractions_without_db_entries(client: AsyncClient, app: Fas
     assert not infractions
 
 
+async def test_list_infractions(
+    client: AsyncClient, app: FastAPI, created_infraction: models.InfractionResponse
+) -> None:
+    """Listing infractions should return every infraction with the fields of its response model."""
+    response = await client.get(app.url_path_for("get_infractions"))
+    assert response.status_code == 200
+    assert response.json() == [created_infraction.dict()]
+
+
+async def test_stream_infractions(
+    client: AsyncClient, app: FastAPI, created_infraction: models.InfractionResponse
+) -> None:
+    """Streaming infractions as NDJSON should yield one infraction per line."""
+    response = await client.get(app.url_path_for("get_infractions"), headers={"Accept": "application/x-ndjson"})
+    assert response.status_code == 200
+    assert [json.loads(line) for line in response.text.splitlines()] == [created_infraction.dict()]
+
+
 async def test_get_nonexsistent_infraction(client: AsyncClient, app: FastAPI) -> None:
     """Getting a nonexistent infraction should return a 404."""
     response = await client.get(app.url_path_for("get_infraction", infraction_id=41902))
@@ -0,0 +1,52 @@
+import pytest
+from fastapi import FastAPI
+from httpx import AsyncClient
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+from api.pool import InstrumentedPool, WaitTimes
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_get_pool_statistics(client: AsyncClient, app: FastAPI) -> None:
+    """Getting the pool statistics should report the primary pool."""
+    response = await client.get(app.url_path_for("get_pool_statistics"))
+
+    assert response.status_code == 200
+    [primary] = response.json()
+    assert primary["name"] == "primary"
+    assert primary["wait_time"]["buckets"][-1]["le"] is None
+
+
+async def test_pool_records_checkouts(create_test_database_engine: AsyncEngine) -> None:
+    """Every checkout should be recorded, and checked out connections reported."""
+    engine = create_async_engine(create_test_database_engine.url, poolclass=InstrumentedPool, pool_size=2)
+
+    try:
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+            statistics = engine.pool.statistics("primary")
+            assert statistics.checked_out == 1
+
+        statistics = engine.pool.statistics("primary")
+        assert statistics.checked_out == 0
+        assert statistics.checked_in == 1
+        assert statistics.wait_time.count == 1
+    finally:
+        await engine.dispose()
+
+    # The recorded wait times survive disposing of the pool.
+    assert engine.pool.statistics("primary").wait_time.count == 1
+
+
+def test_wait_times_buckets() -> None:
+    """Wait times should be counted in the first bucket they fit in."""
+    wait_times = WaitTimes(bounds=(0.1, 1.0))
+    for seconds in (0.05, 0.1, 0.5, 3.0):
+        wait_times.observe(seconds)
+
+    histogram = wait_times.to_model()
+    assert [(bucket.le, bucket.count) for bucket in histogram.buckets] == [(0.1, 2), (1.0, 1), (None, 1)]
+    assert histogram.count == 4
+    assert histogram.sum == pytest.approx(3.65)
@@ -0,0 +1,197 @@
+"""
+Query plan regression tests for the lookups on the hot paths of the routers.
+
+Each test issues a request, captures the SELECT statements the router sent to the database
+and runs them again through `EXPLAIN`. Sequential scans, hash joins and merge joins are
+disabled for the transaction so that the planner picks an index lookup whenever one can serve
+the query, which makes the plans of the tiny test tables representative of the plans on a
+populated database.
+"""
+import re
+from contextlib import contextmanager
+from typing import Any, Iterator
+
+import pytest
+from fastapi import FastAPI
+from httpx import AsyncClient
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+from api import models
+
+pytestmark = pytest.mark.asyncio
+
+SCAN_NODE_TYPES = {"Seq Scan", "Index Scan", "Index Only Scan", "Bitmap Index Scan"}
+
+
+@contextmanager
+def capture_selects(engine: AsyncEngine) -> Iterator[list[tuple[str, Any]]]:
+    """Collect the SELECT statements and their parameters sent through `engine` while the context is active."""
+    statements = []
+
+    def capture(_conn: Any, _cursor: Any, statement: str, parameters: Any, _context: Any, _executemany: bool) -> None:
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    event.listen(engine.sync_engine, "before_cursor_execute", capture)
+    try:
+        yield statements
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", capture)
+
+
+def unbounded_scans(plan: dict[str, Any], indexes: dict[str, tuple[str, bool]]) -> Iterator[str]:
+    """
+    Yield the relations or indexes that `plan` reads without a condition narrowing down the scanned rows.
+
+    `indexes` maps the name of each index to its leading key and whether it is a partial index.
+    An index condition only narrows down the scan when it constrains the leading key of the index,
+    otherwise the whole index is read. Partial indexes only hold the rows matching their predicate,
+    so scanning them as a whole is still a lookup.
+    """
+    if plan["Node Type"] == "Seq Scan":
+        yield plan["Relation Name"]
+    elif plan["Node Type"] in SCAN_NODE_TYPES:
+        leading_key, partial = indexes[plan["Index Name"]]
+        condition = plan.get("Index Cond", "")
+
+        if not partial and not re.search(rf"(?<!\w){re.escape(leading_key)}(?!\w)", condition):
+            yield plan["Index Name"]
+
+    for subplan in plan.get("Plans", []):
+        yield from unbounded_scans(subplan, indexes)
+
+
+async def assert_index_lookups(
+    client: AsyncClient, session: AsyncSession, engine: AsyncEngine, url: str, **params: Any
+) -> None:
+    """Request `url` and check that every SELECT the router issued is answered through an index lookup."""
+    with capture_selects(engine) as statements:
+        response = await client.get(url, params=params)
+
+    assert response.status_code == 200
+    assert statements, "The router did not issue any query"
+
+    connection = await session.connection()
+    for setting in ("enable_seqscan", "enable_hashjoin", "enable_mergejoin"):
+        await connection.exec_driver_sql(f"SET LOCAL {setting} = off")
+    indexes = await connection.exec_driver_sql(
+        "SELECT indexrelid::regclass::text, pg_get_indexdef(indexrelid, 1, true), indpred IS NOT NULL FROM pg_index"
+    )
+    indexes = {name: (leading_key, partial) for name, leading_key, partial in indexes}
+
+    for statement, parameters in statements:
+        result = await connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters)
+        [explained] = result.scalar_one()
+        scans = list(unbounded_scans(explained["Plan"], indexes))
+
+        assert not scans, f"Unbounded scans on {scans} for query:\n{statement}"
+
+
+@pytest.fixture
+async def seeded_codejam(
+    created_codejam: models.CodeJamResponse,
+    created_infraction: models.InfractionResponse,
+    created_winner: models.WinnerResponse,
+) -> models.CodeJamResponse:
+    """Yield a code jam with an infraction and a winner."""
+    yield created_codejam
+
+
+async def test_get_current_team_uses_indexes(
+    client: AsyncClient,
+    app: FastAPI,
+    session: AsyncSession,
+    create_test_database_engine: AsyncEngine,
+    seeded_codejam: models.CodeJamResponse,
+) -> None:
+    """Getting the current team of a user should only issue index lookups."""
+    user = seeded_codejam.teams[0].users[0]
+    url = app.url_path_for("get_current_team", user_id=user.user_id)
+
+    await assert_index_lookups(client, session, create_test_database_engine, url)
+
+
+async def test_get_user_uses_indexes(
+    client: AsyncClient,
+    app: FastAPI,
+    session: AsyncSession,
+    create_test_database_engine: AsyncEngine,
+    seeded_codejam: models.CodeJamResponse,
+) -> None:
+    """Getting the participation history of a user should only issue index lookups."""
+    user = seeded_codejam.teams[0].users[0]
+    url = app.url_path_for("get_user", user_id=user.user_id)
+
+    await assert_index_lookups(client, session, create_test_database_engine, url)
+
+
+async def test_get_current_jam_teams_uses_indexes(
+    client: AsyncClient,
+    app: FastAPI,
+    session: AsyncSession,
+    create_test_database_engine: AsyncEngine,
+    seeded_codejam: models.CodeJamResponse,
+) -> None:
+    """Listing the teams of the ongoing code jam should only issue index lookups."""
+    url = app.url_path_for("get_teams")
+
+    await assert_index_lookups(client, session, create_test_database_engine, url, current_jam=True)
+
+
+async def test_find_team_by_name_uses_indexes(
+    client: AsyncClient,
+    app: FastAPI,
+    session: AsyncSession,
+    create_test_database_engine: AsyncEngine,
+    seeded_codejam: models.CodeJamResponse,
+) -> None:
+    """Finding a team by name, in the ongoing or in a specific code jam, should only issue index lookups."""
+    url = app.url_path_for("find_team_by_name")
+    name = seeded_codejam.teams[0].name
+
+    await assert_index_lookups(client, session, create_test_database_engine, url, name=name)
+    await assert_index_lookups(client, session, create_test_database_engine, url, name=name, jam_id=seeded_codejam.id)
+
+
+async def test_get_codejam_uses_indexes(
+    client: AsyncClient,
+    app: FastAPI,
+    session: AsyncSession,
+    create_test_database_engine: AsyncEngine,
+    seeded_codejam: models.CodeJamResponse,
+) -> None:
+    """Getting a code jam, by ID or as the ongoing code jam, should only issue index lookups."""
+    for codejam_id in (seeded_codejam.id, -1):
+        url = app.url_path_for("get_codejam", codejam_id=codejam_id)
+
+        await assert_index_lookups(client, session, create_test_database_engine, url)
+
+
+async def test_get_team_uses_indexes(
+    client: AsyncClient,
+    app: FastAPI,
+    session: AsyncSession,
+    create_test_database_engine: AsyncEngine,
+    seeded_codejam: models.CodeJamResponse,
+) -> None:
+    """Getting a team and its users should only issue index lookups."""
+    team = seeded_codejam.teams[0]
+
+    for route in ("get_team", "get_team_users"):
+        url = app.url_path_for(route, team_id=team.id)
+
+        await assert_index_lookups(client, session, create_test_database_engine, url)
+
+
+async def test_get_winners_uses_indexes(
+    client: AsyncClient,
+    app: FastAPI,
+    session: AsyncSession,
+    create_test_database_engine: AsyncEngine,
+    seeded_codejam: models.CodeJamResponse,
+) -> None:
+    """Getting the winners of a code jam should only issue index lookups."""
+    url = app.url_path_for("get_winners", jam_id=seeded_codejam.id)
+
+    await assert_index_lookups(client, session, create_test_database_engine, url)
@@ -1,9 +1,13 @@
 """Tests for the infractions router."""
+import json
+
 import pytest
 from fastapi import FastAPI
 from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from api import models
+from api.response_cache import response_cache
 
 pytestmark = pytest.mark.asyncio
 
@@ -63,6 +67,18 @@ async def test_list_team_with_existing_jam(
     assert created_codejam.teams == [models.TeamResponse(**team) for team in raw]
 
 
+async def test_stream_teams(client: AsyncClient, app: FastAPI, created_codejam: models.CodeJamResponse) -> None:
+    """Streaming teams as NDJSON should yield the same teams as listing them, one per line."""
+    for params in ({}, {"current_jam": True}):
+        listed = await client.get(app.url_path_for("get_teams"), params=params)
+        streamed = await client.get(
+            app.url_path_for("get_teams"), params=params, headers={"Accept": "application/x-ndjson, */*;q=0.1"}
+        )
+
+        assert streamed.status_code == 200
+        assert [json.loads(line) for line in streamed.text.splitlines()] == listed.json()
+
+
 async def test_add_user_to_team(
     client: AsyncClient,
     app: FastAPI,
@@ -180,3 +196,47 @@ async def test_find_team_by_name_using_specific_jam(
 
     parsed = models.TeamResponse(**response.json())
     assert parsed == team
+
+
+async def test_get_teams_answers_conditional_requests(
+    client: AsyncClient, app: FastAPI, session: AsyncSession, created_codejam: models.CodeJamResponse
+) -> None:
+    """Teams should get a 304 until they change, when matching the ETag of the previous response."""
+    url = app.url_path_for("get_teams")
+    response = await client.get(url)
+    etag = response.headers["ETag"]
+
+    unchanged = await client.get(url, headers={"If-None-Match": etag})
+    assert unchanged.status_code == 304
+    assert unchanged.headers["ETag"] == etag
+    assert not unchanged.content
+
+    team = created_codejam.teams[0]
+    removed = await client.delete(
+        app.url_path_for("remove_user_from_team", team_id=team.id, user_id=team.users[0].user_id)
+    )
+    assert removed.status_code == 204
+    # Versions are incremented once the transaction of the request commits, which the tests' session doesn't.
+    await session.commit()
+
+    changed = await client.get(url, headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+
+
+@pytest.mark.parametrize(
+    ("path", "status_code"), [("/teams/", 304), ("/teams/999999", 404), ("/teams/abc", 422), ("/teams/find", 422)]
+)
+async def test_conditional_requests_only_match_successful_responses(
+    client: AsyncClient, app: FastAPI, created_codejam: models.CodeJamResponse, path: str, status_code: int
+) -> None:
+    """Requests with the ETag of another route of the router should get the response they would get without it."""
+    etag = (await client.get(app.url_path_for("get_teams"))).headers["ETag"]
+    response_cache.clear()
+
+    response = await client.get(path, headers={"If-None-Match": etag})
+    assert response.status_code == status_code
+
+    # Whatever the route, `*` never matches.
+    response = await client.get(path, headers={"If-None-Match": "*"})
+    assert response.status_code == (200 if status_code == 304 else status_code)
@@ -1,9 +1,16 @@
 """Tests for the users router."""
+import json
+from typing import Any
+
+import orjson
 import pytest
 from fastapi import FastAPI
 from httpx import AsyncClient
+from sqlalchemy import delete, event
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
 
-from api import models
+from api import changes, models
+from api.database import TeamUser, User
 
 pytestmark = pytest.mark.asyncio
 
@@ -34,6 +41,56 @@ async def test_list_users_with_existing_jam(
     assert users
 
 
+async def test_list_users_matches_single_user_history(
+    client: AsyncClient,
+    app: FastAPI,
+    created_winner: models.WinnerResponse,
+    created_infraction: models.InfractionResponse,
+) -> None:
+    """Every listed user should have the same participation history as when getting that user directly."""
+    response = await client.post(app.url_path_for("create_user", user_id=1234))
+    assert response.status_code == 200
+
+    response = await client.get(app.url_path_for("get_users"))
+    assert response.status_code == 200
+    listed = {raw["id"]: raw for raw in response.json()}
+    users = {user_id: models.UserResponse(**raw) for user_id, raw in listed.items()}
+
+    assert not users[1234].participation_history
+
+    [winner_participation] = users[created_winner.user_id].participation_history
+    assert winner_participation.top_10
+    assert winner_participation.first_place == created_winner.first_place
+
+    [infraction_participation] = users[created_infraction.user_id].participation_history
+    assert infraction_participation.infractions == [created_infraction]
+
+    for user_id, user in users.items():
+        response = await client.get(app.url_path_for("get_user", user_id=user_id))
+        assert response.status_code == 200
+        assert models.UserResponse(**response.json()) == user
+        # Down to the order of the fields.
+        assert response.content == orjson.dumps(listed[user_id])
+
+
+async def test_stream_users(
+    client: AsyncClient,
+    app: FastAPI,
+    created_winner: models.WinnerResponse,
+    created_infraction: models.InfractionResponse,
+) -> None:
+    """Streaming users as NDJSON should yield the same users as listing them, one per line."""
+    response = await client.post(app.url_path_for("create_user", user_id=1234))
+    assert response.status_code == 200
+
+    listed = await client.get(app.url_path_for("get_users"))
+    streamed = await client.get(app.url_path_for("get_users"), headers={"Accept": "application/x-ndjson"})
+
+    assert streamed.status_code == 200
+    assert streamed.headers["Content-Type"] == "application/x-ndjson"
+    assert [json.loads(line) for line in streamed.text.splitlines()] == listed.json()
+
+
 async def test_get_users_from_existing_jam(
     client: AsyncClient, codejam: models.CodeJam, created_codejam: models.CodeJamResponse, app: FastAPI
 ) -> None:
@@ -110,3 +167,83 @@ async def test_get_current_team_with_participating_user(
     assert data["user_id"] == user.user_id
     assert data["team"] == team
     assert data["is_leader"] == user.is_leader
+
+
+async def test_get_current_team_with_membership_added_elsewhere(
+    client: AsyncClient, created_codejam: models.CodeJamResponse, app: FastAPI, session: AsyncSession
+) -> None:
+    """Getting the current team of a user added to a team by another process should return code 200."""
+    team = created_codejam.teams[1]
+    user = created_codejam.teams[0].users[0]
+
+    # Build the roster of the ongoing jam before the user is added.
+    response = await client.get(app.url_path_for("get_current_team", user_id=team.users[0].user_id))
+    assert response.status_code == 200
+
+    session.add(User(id=4242))
+    await session.flush()
+    session.add(TeamUser(team_id=team.id, user_id=4242, is_leader=False))
+    await session.flush()
+
+    response = await client.get(app.url_path_for("get_current_team", user_id=4242))
+    assert response.status_code == 200
+    assert response.json()["team"]["id"] == team.id
+
+    # Users already in the roster are still served from it.
+    response = await client.get(app.url_path_for("get_current_team", user_id=user.user_id))
+    assert response.status_code == 200
+    assert response.json()["team"]["id"] == created_codejam.teams[0].id
+
+
+async def test_get_current_team_with_membership_removed_without_notification(
+    client: AsyncClient, created_codejam: models.CodeJamResponse, app: FastAPI, session: AsyncSession
+) -> None:
+    """The roster should be reloaded when the teams changed, even if this process wasn't notified."""
+    user = created_codejam.teams[0].users[0]
+    url = app.url_path_for("get_current_team", user_id=user.user_id)
+    # Commit the jam first, which notifies of its changes.
+    await session.commit()
+
+    response = await client.get(url)
+    assert response.status_code == 200
+
+    # As another process would, without the notification reaching this one.
+    await session.execute(delete(TeamUser).where(TeamUser.user_id == user.user_id))
+    session.info[changes.CHANGED_RESOURCES_KEY] = {changes.TEAMS}
+    await session.commit()
+
+    response = await client.get(url)
+    assert response.status_code == 404
+
+
+@pytest.mark.parametrize("ongoing_route", ["get_current_team", "get_codejam"])
+async def test_repeated_requests_skip_the_database(
+    client: AsyncClient,
+    created_codejam: models.CodeJamResponse,
+    app: FastAPI,
+    create_test_database_engine: AsyncEngine,
+    ongoing_route: str,
+) -> None:
+    """Requests whose response is cached should be answered without a single query, versions included."""
+    if ongoing_route == "get_current_team":
+        url = app.url_path_for(ongoing_route, user_id=created_codejam.teams[0].users[0].user_id)
+    else:
+        url = app.url_path_for(ongoing_route, codejam_id=-1)
+
+    first = await client.get(url)
+    assert first.status_code == 200
+
+    statements = []
+    engine = create_test_database_engine.sync_engine
+
+    def capture(_conn: Any, _cursor: Any, statement: str, *_args: Any) -> None:
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        response = await client.get(url)
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+
+    assert response.json() == first.json()
+    assert statements == []
@@ -2,8 +2,10 @@
 import pytest
 from fastapi import FastAPI
 from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from api import models
+from api.database import Winner as DbWinner
 
 pytestmark = pytest.mark.asyncio
 
@@ -67,3 +69,23 @@ async def test_create_winners_with_existing_winner(
         app.url_path_for("create_winners", jam_id=created_winner.jam_id), json=[created_winner.dict(exclude={"jam_id"})]
     )
     assert response.status_code == 409
+
+
+async def test_get_winners_is_cached_until_winners_change(
+    client: AsyncClient, app: FastAPI, created_codejam: models.CodeJamResponse, session: AsyncSession
+) -> None:
+    """Winners should be served from the cache until winners are created through the API."""
+    url = app.url_path_for("get_winners", jam_id=created_codejam.id)
+    users = [user.user_id for team in created_codejam.teams for user in team.users]
+    assert (await client.get(url)).json() == []
+
+    session.add(DbWinner(jam_id=created_codejam.id, user_id=users[0], first_place=True))
+    await session.flush()
+    assert (await client.get(url)).json() == []
+
+    response = await client.post(
+        app.url_path_for("create_winners", jam_id=created_codejam.id),
+        json=[{"user_id": users[1], "first_place": False}],
+    )
+    assert response.status_code == 200
+    assert {winner["user_id"] for winner in (await client.get(url)).json()} == set(users[:2])
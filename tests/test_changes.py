@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+from _pytest.monkeypatch import MonkeyPatch
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from api import changes
+from api.constants import Config
+
+pytestmark = pytest.mark.asyncio
+
+
+def collect_changes(monkeypatch: MonkeyPatch) -> asyncio.Queue:
+    """Replace the subscribers with one queuing the changed resources."""
+    received = asyncio.Queue()
+    monkeypatch.setattr(changes, "_subscribers", [received.put_nowait])
+    return received
+
+
+async def test_receive_ignores_own_and_malformed_notifications(monkeypatch: MonkeyPatch) -> None:
+    """Only the well-formed notifications of other processes should notify the subscribers and update the versions."""
+    received = collect_changes(monkeypatch)
+
+    changes.receive(f'{{"origin": "{changes.ORIGIN}", "versions": {{"users": 7}}}}')
+    changes.receive('{"origin": "other"}')
+    changes.receive('{"origin": "other", "versions": ["teams"]}')
+    changes.receive("not json")
+    changes.receive('{"origin": "other", "versions": {"teams": 3, "unknown": 1}}')
+
+    assert received.get_nowait() == {changes.TEAMS}
+    assert received.empty()
+    assert changes.known_versions._versions == {changes.TEAMS: 3}
+
+
+async def test_listen_receives_committed_changes_of_other_processes(monkeypatch: MonkeyPatch) -> None:
+    """Changes published by another process should be received once its transaction commits."""
+    received = collect_changes(monkeypatch)
+    engine = create_async_engine(Config.DATABASE_URL, poolclass=NullPool)
+    listener = asyncio.create_task(changes.listen(engine))
+
+    try:
+        assert await asyncio.wait_for(received.get(), timeout=5) == changes.RESOURCES
+
+        async with AsyncSession(engine) as session:
+            message = '{"origin": "other", "versions": {"winners": 1}}'
+            await session.execute(select(func.pg_notify(changes.CHANNEL, message)))
+            await asyncio.sleep(0.1)
+            assert received.empty()
+
+            await session.commit()
+
+        assert await asyncio.wait_for(received.get(), timeout=5) == {changes.WINNERS}
+    finally:
+        listener.cancel()
+        await engine.dispose()
+
+
+async def test_publish_increments_versions(session: AsyncSession) -> None:
+    """Committing changes should increment the versions of the changed resources only, once per transaction."""
+    resources = frozenset({changes.TEAMS, changes.USERS, changes.WINNERS})
+
+    await changes.publish(session, changes.TEAMS)
+    await session.commit()
+
+    await changes.publish(session, changes.USERS, user_id=1)
+    await changes.publish(session, changes.TEAMS, changes.USERS, team_id=1)
+    assert await changes.versions(session, resources) == {changes.TEAMS: 1, changes.USERS: 0, changes.WINNERS: 0}
+
+    await session.commit()
+    assert await changes.versions(session, resources) == {changes.TEAMS: 2, changes.USERS: 1, changes.WINNERS: 0}
+
+
+async def test_rolled_back_changes_are_forgotten(session: AsyncSession) -> None:
+    """The resources changed by a transaction that was rolled back shouldn't be incremented by the next one."""
+    await changes.publish(session, changes.TEAMS)
+    # Rolling back the session of the tests would drop its tables.
+    changes.forget_changes(session.sync_session)
+    await session.commit()
+
+    assert await changes.versions(session, frozenset({changes.TEAMS})) == {changes.TEAMS: 0}
@@ -0,0 +1,121 @@
+import asyncio
+import gzip
+from typing import Optional
+
+import brotli
+import orjson
+import pytest
+from fastapi import FastAPI
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.datastructures import Headers
+from starlette.types import Message, Receive, Scope, Send
+
+from api.compression import CompressionMiddleware, compressed_variant, negotiate
+from api.database import ArchivedJam, Jam
+from api.response_cache import response_cache
+
+
+@pytest.mark.parametrize(
+    ("accept_encoding", "encoding"),
+    [
+        ("", None),
+        ("identity", None),
+        ("gzip, deflate", "gzip"),
+        ("gzip, deflate, br", "br"),
+        ("br;q=0.5, gzip", "gzip"),
+        ("br;q=0, *", "gzip"),
+        ("gzip;q=invalid", None),
+    ],
+)
+def test_negotiate(accept_encoding: str, encoding: Optional[str]) -> None:
+    """The accepted encoding with the highest quality should be chosen, favouring brotli on ties."""
+    assert negotiate(accept_encoding) == encoding
+
+
+def test_compressed_variant_is_reused() -> None:
+    """Bodies should only be compressed once per encoding, and only when large enough and not already encoded."""
+    body = b"[" + b"1," * 1000 + b"1]"
+    headers = Headers({"content-type": "application/json"})
+    variants = {}
+
+    assert gzip.decompress(compressed_variant(body, headers, "gzip", variants)) == body
+    assert compressed_variant(body, headers, "gzip", variants) is variants["gzip"]
+    assert compressed_variant(b"[]", headers, "gzip", variants) is None
+    assert compressed_variant(body, Headers({"content-type": "image/png"}), "gzip", variants) is None
+
+
+@pytest.mark.asyncio
+async def test_large_responses_are_compressed(client: AsyncClient, app: FastAPI, session: AsyncSession) -> None:
+    """Large JSON responses should be compressed with the negotiated encoding, and cached compressed."""
+    session.add_all([Jam(name=f"Code Jam {jam_id}" * 10) for jam_id in range(20)])
+    await session.flush()
+    url = app.url_path_for("get_codejams")
+
+    response = await client.get(url, headers={"Accept-Encoding": "br"})
+    assert response.headers["Content-Encoding"] == "br"
+    assert response.headers["Vary"] == "Accept-Encoding"
+
+    cached = await client.get(url, headers={"Accept-Encoding": "br"})
+    assert cached.headers["Content-Length"] == str(len(brotli.compress(cached.content, quality=5)))
+    assert cached.json() == response.json()
+
+    identity = await client.get(url, headers={"Accept-Encoding": "identity"})
+    assert "Content-Encoding" not in identity.headers
+    assert identity.json() == response.json()
+
+    # Each encoding has its own ETag, which is still fresh.
+    assert response.headers["ETag"] == cached.headers["ETag"] == identity.headers["ETag"][:-1] + '-br"'
+    unchanged = await client.get(url, headers={"Accept-Encoding": "br", "If-None-Match": response.headers["ETag"]})
+    assert unchanged.status_code == 304
+    assert unchanged.headers["ETag"] == response.headers["ETag"]
+
+    small = await client.get(app.url_path_for("get_infractions"), headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in small.headers
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("read_primary", ["0", "1"])
+async def test_archived_codejams_are_sent_as_stored(
+    client: AsyncClient, app: FastAPI, session: AsyncSession, read_primary: str
+) -> None:
+    """Archived code jams should be sent with the gzip document they were archived with, cached or not."""
+    jam = Jam(name="Archived Jam" * 100, ongoing=False)
+    session.add(jam)
+    await session.flush()
+    await client.post(app.url_path_for("archive_codejam", codejam_id=jam.id))
+    response_cache.clear()
+
+    stored = await session.get(ArchivedJam, jam.id)
+    url = app.url_path_for("get_codejam", codejam_id=jam.id)
+    headers = {"Accept-Encoding": "gzip", "X-Read-Primary": read_primary}
+    async with client.stream("GET", url, headers=headers) as response:
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert b"".join([chunk async for chunk in response.aiter_raw()]) == stored.document
+
+    assert orjson.loads(gzip.decompress(stored.document))["name"] == jam.name
+
+
+@pytest.mark.asyncio
+async def test_streams_are_sent_as_they_come() -> None:
+    """The headers and chunks of streamed responses should be sent right away, without being compressed."""
+    chunk_sent = asyncio.Event()
+    messages = []
+
+    async def stream(scope: Scope, receive: Receive, send: Send) -> None:
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"text/plain")]})
+        assert messages[-1]["type"] == "http.response.start"
+
+        await send({"type": "http.response.body", "body": b"a" * 1000, "more_body": True})
+        assert messages[-1]["body"] == b"a" * 1000
+        chunk_sent.set()
+        await send({"type": "http.response.body", "body": b""})
+
+    async def send(message: Message) -> None:
+        messages.append(message)
+
+    scope = {"type": "http", "headers": [(b"accept-encoding", b"gzip")]}
+    await CompressionMiddleware(stream)(scope, None, send)
+
+    assert chunk_sent.is_set()
+    assert b"content-encoding" not in dict(messages[0]["headers"])
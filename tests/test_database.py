@@ -0,0 +1,64 @@
+import pytest
+from sqlalchemy import insert, text
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.future import select
+from sqlalchemy.orm import selectinload
+
+from api.database import Base, Jam, ReadOnlySession, Team, TeamUser, User, read_from_primary
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_read_only_session_releases_connection(create_test_database_engine: AsyncEngine) -> None:
+    """Read-only sessions should return their connection after every statement, keeping the loaded objects."""
+    engine = create_test_database_engine.execution_options(isolation_level="AUTOCOMMIT")
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(insert(Jam).values(id=1, name="Jam"))
+        await conn.execute(insert(User).values(id=1))
+        await conn.execute(insert(Team).values(id=1, jam_id=1, name="Team"))
+        await conn.execute(insert(TeamUser).values(team_id=1, user_id=1, is_leader=True))
+
+    async with ReadOnlySession(engine, expire_on_commit=False) as session:
+        teams = await session.execute(select(Team).options(selectinload(Team.users)))
+
+        assert not session.in_transaction()
+        assert create_test_database_engine.pool.checkedout() == 0
+        [team] = teams.scalars().all()
+        assert [user.user_id for user in team.users] == [1]
+
+
+async def test_read_only_session_routes_to_primary(create_test_database_engine: AsyncEngine) -> None:
+    """Read-only sessions should read from their bind, unless told to read from the primary."""
+
+    def engine_named(name: str) -> AsyncEngine:
+        return create_async_engine(
+            create_test_database_engine.url, connect_args={"server_settings": {"application_name": name}}
+        )
+
+    replica, primary = engine_named("replica"), engine_named("primary")
+    query = text("SELECT current_setting('application_name')")
+
+    try:
+        async with ReadOnlySession(replica, primary=primary) as session:
+            assert (await session.execute(query)).scalar_one() == "replica"
+
+            with read_from_primary(session):
+                assert (await session.execute(query)).scalar_one() == "primary"
+
+            assert (await session.execute(query)).scalar_one() == "replica"
+    finally:
+        await replica.dispose()
+        await primary.dispose()
+
+
+async def test_read_only_session_streams_in_transaction(create_test_database_engine: AsyncEngine) -> None:
+    """Read-only sessions should stream results through a server-side cursor, in a read-only transaction."""
+    engine = create_test_database_engine.execution_options(isolation_level="AUTOCOMMIT")
+
+    async with ReadOnlySession(engine) as session:
+        rows = await session.stream(text("SELECT generate_series(1, 3), current_setting('transaction_read_only')"))
+
+        assert [tuple(row) async for row in rows] == [(1, "on"), (2, "on"), (3, "on")]
@@ -0,0 +1,24 @@
+import pytest
+from _pytest.monkeypatch import MonkeyPatch
+
+from api.constants import Config
+from api.documents import render
+from api.models import User
+
+
+def test_render_checks_documents_against_model(monkeypatch: MonkeyPatch) -> None:
+    """Documents that differ from their validated model should be rejected when responses are validated."""
+    monkeypatch.setattr(Config, "VALIDATE_RESPONSES", True)
+
+    assert render({"user_id": 1, "is_leader": True}, User).body == b'{"user_id":1,"is_leader":true}'
+
+    for document in ({"user_id": "1", "is_leader": True}, {"user_id": 1, "is_leader": True, "team_id": 2}):
+        with pytest.raises(ValueError):
+            render(document, User)
+
+
+def test_render_trusts_documents(monkeypatch: MonkeyPatch) -> None:
+    """Documents should be rendered as they are when responses aren't validated."""
+    monkeypatch.setattr(Config, "VALIDATE_RESPONSES", False)
+
+    assert render({"user_id": "1"}, User).body == b'{"user_id":"1"}'
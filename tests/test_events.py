@@ -0,0 +1,69 @@
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.database import Change
+from api.events import Broadcaster, format_event
+
+pytestmark = pytest.mark.asyncio
+
+
+async def add_changes(session: AsyncSession, count: int) -> list[Change]:
+    """Add `count` changes to the change log, committed by earlier transactions."""
+    changes = [Change(position=1, resources=["teams"], team_id=team_id) for team_id in range(count)]
+    session.add_all(changes)
+    await session.flush()
+    return changes
+
+
+async def test_broadcast_disconnects_slow_clients() -> None:
+    """Clients whose queue is full should be disconnected, without affecting the others."""
+    broadcaster = Broadcaster(buffer_size=2)
+    slow, fast = broadcaster.connect(), broadcaster.connect()
+
+    for team_id in range(3):
+        broadcaster.broadcast((1, team_id), {"team_id": team_id})
+        fast.get_nowait()
+
+    assert slow.get_nowait() is None
+    assert slow.empty()
+
+    broadcaster.broadcast((1, 3), {"team_id": 3})
+    assert fast.get_nowait() == ((1, 3), format_event((1, 3), {"team_id": 3}))
+    assert slow.empty()
+
+
+async def test_fetch_broadcasts_new_changes(session: AsyncSession) -> None:
+    """Only the changes made after the broadcaster started should be broadcast, in order."""
+    broadcaster = Broadcaster(buffer_size=10)
+    queue = broadcaster.connect()
+    await add_changes(session, 1)
+
+    await broadcaster.fetch(session)
+    assert queue.empty()
+
+    changes = await add_changes(session, 2)
+    await broadcaster.fetch(session)
+
+    assert [queue.get_nowait()[0] for _change in changes] == [(1, change.id) for change in changes]
+    assert broadcaster.last_key == (1, changes[-1].id)
+
+
+async def test_stream_resumes_from_last_event(session: AsyncSession) -> None:
+    """Resuming clients should get the changes they missed, then the broadcast ones, each once."""
+    keys = [(1, change.id) for change in await add_changes(session, 3)]
+    broadcaster = Broadcaster(buffer_size=2)
+    stream = broadcaster.stream(session, keys[0])
+
+    events = [await anext(stream)]
+    broadcaster.broadcast(keys[2], {})
+    broadcaster.broadcast((1, 10**9), {})
+    events += [await anext(stream), await anext(stream)]
+
+    assert [event.split(b"\n")[0] for event in events] == [
+        format_event(key, {}).split(b"\n")[0] for key in [*keys[1:], (1, 10**9)]
+    ]
+    assert events[0].startswith(b"id: ") and b"event: change\ndata: {" in events[0]
+
+    for team_id in range(3):
+        broadcaster.broadcast((2, team_id), {})
+    assert [event async for event in stream] == []
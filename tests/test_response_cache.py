@@ -0,0 +1,92 @@
+from typing import Optional
+
+import pytest
+from _pytest.monkeypatch import MonkeyPatch
+from fastapi import Request, Response
+
+from api import response_cache as response_cache_module
+from api.response_cache import ResponseCache, bypasses_cache, make_etag, matching_etag
+
+
+def make_request(if_none_match: str = "", **headers: str) -> Request:
+    """Build a GET request with the given `If-None-Match` header, and other headers."""
+    headers = [(b"if-none-match", if_none_match.encode())] + [
+        (name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()
+    ]
+    return Request({"type": "http", "method": "GET", "path": "/", "query_string": b"", "headers": headers})
+
+
+def test_cache_is_invalidated_by_resource() -> None:
+    """Only the responses built from a changed resource should be dropped."""
+    cache = ResponseCache(max_size=10, ttl=60)
+    teams, winners = frozenset({"teams"}), frozenset({"winners"})
+
+    cache.put(("/teams/",), teams, cache.generations(teams), Response("teams"))
+    cache.put(("/winners/",), winners, cache.generations(winners), Response("winners"))
+    cache.invalidate(teams)
+
+    assert cache.get(("/teams/",)) is None
+    assert cache.get(("/winners/",)).body == b"winners"
+
+
+def test_cache_skips_responses_built_during_changes() -> None:
+    """Responses whose resources changed while they were built shouldn't be cached."""
+    cache = ResponseCache(max_size=10, ttl=60)
+    teams = frozenset({"teams"})
+
+    generations = cache.generations(teams)
+    cache.invalidate(teams)
+    cache.put(("/teams/",), teams, generations, Response("teams"))
+
+    assert cache.get(("/teams/",)) is None
+
+
+def test_cache_evicts_expired_and_least_recently_used(monkeypatch: MonkeyPatch) -> None:
+    """Responses should be dropped once they expire, or when the cache is full."""
+    now = 0.0
+    monkeypatch.setattr(response_cache_module.time, "monotonic", lambda: now)
+    cache = ResponseCache(max_size=2, ttl=10)
+    teams = frozenset({"teams"})
+
+    for key in ("a", "b", "c"):
+        if key == "c":
+            assert cache.get(("a",)).body == b"a"
+        cache.put((key,), teams, cache.generations(teams), Response(key))
+    assert cache.get(("b",)) is None
+    assert cache.get(("a",)).body == b"a"
+
+    now = 10.0
+    assert cache.get(("a",)) is None
+
+
+def test_etag_depends_on_versions() -> None:
+    """The ETag should be strong, and change along with any version."""
+    etag = make_etag({"codejams": 1, "teams": 2})
+
+    assert etag.startswith('"') and etag.endswith('"')
+    assert etag == make_etag({"teams": 2, "codejams": 1})
+    assert etag != make_etag({"codejams": 1, "teams": 3})
+
+
+@pytest.mark.parametrize(
+    ("if_none_match", "matched"),
+    [
+        ('"a"', '"a"'),
+        ('W/"a"', '"a"'),
+        ('"b", "a"', '"a"'),
+        ('"b", "a-br"', '"a-br"'),
+        ("*", None),
+        ('"b"', None),
+        ('"a-deflate"', None),
+        ("", None),
+    ],
+)
+def test_matching_etag(if_none_match: str, matched: Optional[str]) -> None:
+    """The `If-None-Match` header should match any of its ETags, weakly compared, in any encoding, but not `*`."""
+    assert matching_etag(make_request(if_none_match), '"a"') == matched
+
+
+@pytest.mark.parametrize(("read_primary", "bypasses"), [("1", True), ("true", True), ("0", False), ("false", False)])
+def test_reading_from_primary_bypasses_cache(read_primary: str, bypasses: bool) -> None:
+    """Only the requests reading from the primary should bypass the cache, whatever the header is set to."""
+    assert bypasses_cache(make_request(x_read_primary=read_primary)) is bypasses